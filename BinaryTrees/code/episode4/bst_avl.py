@@ -3,13 +3,17 @@ Episode 4: Binary Search Trees and AVL Trees
 In-memory data structures for fast lookups
 """
 
-from typing import Optional, Any, List
+from array import array
+from collections import deque
+from typing import Optional, Any, List, Tuple
 
 
 class BSTNode:
     """Binary Search Tree Node."""
     
-    def __init__(self, key: int, value: Any):
+    __slots__ = ('key', 'value', 'left', 'right')  # No per-node __dict__
+    
+    def __init__(self, key: int, value: Any) -> None:
         self.key = key
         self.value = value
         self.left: Optional['BSTNode'] = None
@@ -24,83 +28,83 @@ class BinarySearchTree:
     Problem: Can become unbalanced
     """
     
-    def __init__(self):
+    def __init__(self) -> None:
         self.root: Optional[BSTNode] = None
         self.size = 0
     
     def insert(self, key: int, value: Any) -> None:
-        """Insert key-value pair."""
+        """Insert key-value pair (iterative: safe on skewed trees)."""
         if self.root is None:
             self.root = BSTNode(key, value)
             self.size += 1
-        else:
-            self._insert_recursive(self.root, key, value)
-    
-    def _insert_recursive(self, node: BSTNode, key: int, value: Any) -> BSTNode:
-        """Helper: Insert recursively."""
-        if key < node.key:
-            if node.left is None:
-                node.left = BSTNode(key, value)
-                self.size += 1
-            else:
-                self._insert_recursive(node.left, key, value)
-        elif key > node.key:
-            if node.right is None:
-                node.right = BSTNode(key, value)
-                self.size += 1
-            else:
-                self._insert_recursive(node.right, key, value)
-        else:
-            # Update existing key
-            node.value = value
+            return
         
-        return node
+        node = self.root
+        while True:
+            if key < node.key:
+                if node.left is None:
+                    node.left = BSTNode(key, value)
+                    self.size += 1
+                    return
+                node = node.left
+            elif key > node.key:
+                if node.right is None:
+                    node.right = BSTNode(key, value)
+                    self.size += 1
+                    return
+                node = node.right
+            else:
+                # Update existing key
+                node.value = value
+                return
     
     def search(self, key: int) -> Optional[Any]:
-        """Search for key."""
-        return self._search_recursive(self.root, key)
-    
-    def _search_recursive(self, node: Optional[BSTNode], key: int) -> Optional[Any]:
-        """Helper: Search recursively."""
-        if node is None:
-            return None
-        
-        if key == node.key:
-            return node.value
-        elif key < node.key:
-            return self._search_recursive(node.left, key)
-        else:
-            return self._search_recursive(node.right, key)
+        """Search for key (iterative descent)."""
+        node = self.root
+        while node is not None:
+            if key == node.key:
+                return node.value
+            node = node.left if key < node.key else node.right
+        return None
     
     def inorder_traversal(self) -> List[tuple]:
-        """Return sorted list of (key, value) pairs."""
+        """Return sorted list of (key, value) pairs (explicit stack)."""
         result = []
-        self._inorder_recursive(self.root, result)
-        return result
-    
-    def _inorder_recursive(self, node: Optional[BSTNode], result: List) -> None:
-        """Helper: Inorder traversal."""
-        if node is not None:
-            self._inorder_recursive(node.left, result)
+        stack: List[BSTNode] = []
+        node = self.root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
             result.append((node.key, node.value))
-            self._inorder_recursive(node.right, result)
+            node = node.right
+        return result
     
     def height(self) -> int:
-        """Calculate tree height."""
-        return self._height_recursive(self.root)
-    
-    def _height_recursive(self, node: Optional[BSTNode]) -> int:
-        """Helper: Calculate height recursively."""
-        if node is None:
+        """Calculate tree height (BFS level count)."""
+        if self.root is None:
             return 0
-        return 1 + max(self._height_recursive(node.left), 
-                       self._height_recursive(node.right))
+        
+        height = 0
+        level = deque([self.root])
+        while level:
+            height += 1
+            for _ in range(len(level)):
+                node = level.popleft()
+                if node.left is not None:
+                    level.append(node.left)
+                if node.right is not None:
+                    level.append(node.right)
+        return height
 
 
 class AVLNode:
     """AVL Tree Node (with balance factor)."""
     
-    def __init__(self, key: int, value: Any):
+    __slots__ = ('key', 'value', 'left', 'right', 'height')  # No per-node __dict__
+    
+    def __init__(self, key: int, value: Any) -> None:
         self.key = key
         self.value = value
         self.left: Optional['AVLNode'] = None
@@ -116,7 +120,7 @@ class AVLTree:
     Maintains balance: |height(left) - height(right)| <= 1
     """
     
-    def __init__(self):
+    def __init__(self) -> None:
         self.root: Optional[AVLNode] = None
         self.size = 0
     
@@ -147,22 +151,28 @@ class AVLTree:
         balance = self._get_balance(node)
         
         # Rebalance if needed
-        # Left-Left case
-        if balance > 1 and key < node.left.key:
-            return self._rotate_right(node)
-        
-        # Right-Right case
-        if balance < -1 and key > node.right.key:
-            return self._rotate_left(node)
-        
-        # Left-Right case
-        if balance > 1 and key > node.left.key:
-            node.left = self._rotate_left(node.left)
+        if balance > 1:
+            left = node.left
+            assert left is not None  # Left-heavy => left child exists
+            
+            # Left-Left case
+            if key < left.key:
+                return self._rotate_right(node)
+            
+            # Left-Right case
+            node.left = self._rotate_left(left)
             return self._rotate_right(node)
         
-        # Right-Left case
-        if balance < -1 and key < node.right.key:
-            node.right = self._rotate_right(node.right)
+        if balance < -1:
+            right = node.right
+            assert right is not None  # Right-heavy => right child exists
+            
+            # Right-Right case
+            if key > right.key:
+                return self._rotate_left(node)
+            
+            # Right-Left case
+            node.right = self._rotate_right(right)
             return self._rotate_left(node)
         
         return node
@@ -170,6 +180,7 @@ class AVLTree:
     def _rotate_left(self, z: AVLNode) -> AVLNode:
         """Left rotation."""
         y = z.right
+        assert y is not None
         T2 = y.left
         
         # Perform rotation
@@ -185,6 +196,7 @@ class AVLTree:
     def _rotate_right(self, z: AVLNode) -> AVLNode:
         """Right rotation."""
         y = z.left
+        assert y is not None
         T3 = y.right
         
         # Perform rotation
@@ -209,35 +221,226 @@ class AVLTree:
             return 0
         return self._get_height(node.left) - self._get_height(node.right)
     
+    def bulk_load(self, sorted_pairs: List[Tuple[int, Any]]) -> None:
+        """
+        Build a perfectly balanced tree from (key, value) pairs sorted by key.
+        
+        Divide and conquer: the midpoint becomes the root, each half
+        builds a subtree. O(n) with zero rotations, vs O(n log n) for n
+        inserts. Replaces any existing contents.
+        """
+        if any(a[0] >= b[0] for a, b in zip(sorted_pairs, sorted_pairs[1:])):
+            raise ValueError("bulk_load() needs pairs sorted by unique key")
+        
+        def build(lo: int, hi: int) -> Optional[AVLNode]:
+            if lo > hi:
+                return None
+            mid = (lo + hi) // 2
+            node = AVLNode(*sorted_pairs[mid])
+            node.left = build(lo, mid - 1)
+            node.right = build(mid + 1, hi)
+            node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
+            return node
+        
+        self.root = build(0, len(sorted_pairs) - 1)
+        self.size = len(sorted_pairs)
+    
     def search(self, key: int) -> Optional[Any]:
-        """Search for key."""
-        return self._search_recursive(self.root, key)
+        """Search for key (iterative descent)."""
+        node = self.root
+        while node is not None:
+            if key == node.key:
+                return node.value
+            node = node.left if key < node.key else node.right
+        return None
     
-    def _search_recursive(self, node: Optional[AVLNode], key: int) -> Optional[Any]:
-        """Search recursively."""
-        if node is None:
-            return None
+    def inorder_traversal(self) -> List[tuple]:
+        """Return sorted list (explicit stack)."""
+        result = []
+        stack: List[AVLNode] = []
+        node = self.root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            result.append((node.key, node.value))
+            node = node.right
+        return result
+
+
+# --- SoA AVL kernels -------------------------------------------------------
+# Module-level functions over plain int arrays: no attribute lookups, no
+# per-level method calls, no Python objects created. Slot 0 is a sentinel
+# NIL node with height 0, so heights[left[x]] never needs a None check.
+# (These are also exactly the shape of code numba.njit can compile.)
+
+def _avl_rotate_left(left: 'array[int]', right: 'array[int]', heights: 'array[int]',
+                     z: int) -> int:
+    """Left rotation around z; returns new subtree root."""
+    y = right[z]
+    right[z] = left[y]
+    left[y] = z
+    hl, hr = heights[left[z]], heights[right[z]]
+    hz = 1 + (hl if hl > hr else hr)
+    heights[z] = hz
+    hr = heights[right[y]]
+    heights[y] = 1 + (hz if hz > hr else hr)
+    return y
+
+
+def _avl_rotate_right(left: 'array[int]', right: 'array[int]', heights: 'array[int]',
+                      z: int) -> int:
+    """Right rotation around z; returns new subtree root."""
+    y = left[z]
+    left[z] = right[y]
+    right[y] = z
+    hl, hr = heights[left[z]], heights[right[z]]
+    hz = 1 + (hl if hl > hr else hr)
+    heights[z] = hz
+    hl = heights[left[y]]
+    heights[y] = 1 + (hz if hz > hl else hl)
+    return y
+
+
+def _avl_insert_fixup(keys: 'array[int]', left: 'array[int]', right: 'array[int]',
+                      heights: 'array[int]', path: List[int],
+                      key: int, child: int) -> int:
+    """
+    Hang new node `child` under path[-1] and rebalance bottom-up.
+    
+    Stops early once a subtree height is unchanged (or after the one
+    rotation an insert can need). Returns the (possibly new) root.
+    """
+    root = path[0]
+    for depth in range(len(path) - 1, -1, -1):
+        nid = path[depth]
+        if key < keys[nid]:
+            left[nid] = child
+        else:
+            right[nid] = child
+        
+        hl, hr = heights[left[nid]], heights[right[nid]]
+        if hl - hr > 1:
+            l = left[nid]
+            # Left-Right case
+            if heights[left[l]] < heights[right[l]]:
+                left[nid] = _avl_rotate_left(left, right, heights, l)
+            # Left-Left case
+            child = _avl_rotate_right(left, right, heights, nid)
+        elif hr - hl > 1:
+            r = right[nid]
+            # Right-Left case
+            if heights[right[r]] < heights[left[r]]:
+                right[nid] = _avl_rotate_right(left, right, heights, r)
+            # Right-Right case
+            child = _avl_rotate_left(left, right, heights, nid)
+        else:
+            h = 1 + (hl if hl > hr else hr)
+            if heights[nid] == h:
+                return root  # Height unchanged: ancestors are fine
+            heights[nid] = h
+            child = nid
+            continue
+        
+        # Rotated: subtree is back to its old height, relink and stop
+        if depth == 0:
+            return child
+        parent = path[depth - 1]
+        if key < keys[parent]:
+            left[parent] = child
+        else:
+            right[parent] = child
+        return root
+    
+    return child
+
+
+class ArrayAVLTree:
+    """
+    AVL Tree in Structure-of-Arrays layout.
+    
+    Same algorithm as AVLTree, but there are no node objects:
+    node i lives at index i of parallel arrays (keys, left, right, heights).
+    Child links are integer indices; index 0 is a sentinel NIL node
+    (height 0) meaning "no child".
+    
+    Why: integers packed densely in array.array instead of one heap
+    object per node → less memory, better cache locality, and the
+    hot path is plain int-array code (see the _avl_* kernels above).
+    """
+    
+    NIL = 0
+    
+    def __init__(self) -> None:
+        # Slot 0 = sentinel NIL node
+        self.keys = array('q', [0])
+        self.values: List[Any] = [None]
+        self.left = array('i', [0])
+        self.right = array('i', [0])
+        self.heights = array('i', [0])
+        self.root = self.NIL
+        self.size = 0
+    
+    def insert(self, key: int, value: Any) -> None:
+        """Insert and rebalance (iterative, with an explicit path stack)."""
+        keys, left, right = self.keys, self.left, self.right
+        
+        # Descend, remembering the path
+        path = []
+        nid = self.root
+        while nid:
+            node_key = keys[nid]
+            if key == node_key:
+                self.values[nid] = value  # Update
+                return
+            path.append(nid)
+            nid = left[nid] if key < node_key else right[nid]
+        
+        # Allocate new node = append to every array
+        child = len(keys)
+        keys.append(key)
+        self.values.append(value)
+        left.append(0)
+        right.append(0)
+        self.heights.append(1)
+        self.size += 1
         
-        if key == node.key:
-            return node.value
-        elif key < node.key:
-            return self._search_recursive(node.left, key)
+        if not path:
+            self.root = child
         else:
-            return self._search_recursive(node.right, key)
+            self.root = _avl_insert_fixup(keys, left, right, self.heights,
+                                          path, key, child)
+    
+    def height(self) -> int:
+        """Tree height."""
+        return self.heights[self.root]
+    
+    def search(self, key: int) -> Optional[Any]:
+        """Search for key (iterative descent over index links)."""
+        keys, left, right = self.keys, self.left, self.right
+        nid = self.root
+        while nid:
+            node_key = keys[nid]
+            if key == node_key:
+                return self.values[nid]
+            nid = left[nid] if key < node_key else right[nid]
+        return None
     
     def inorder_traversal(self) -> List[tuple]:
-        """Return sorted list."""
+        """Return sorted list (explicit stack)."""
+        keys, values, left, right = self.keys, self.values, self.left, self.right
         result = []
-        self._inorder_recursive(self.root, result)
+        stack: List[int] = []
+        nid = self.root
+        while stack or nid:
+            while nid:
+                stack.append(nid)
+                nid = left[nid]
+            nid = stack.pop()
+            result.append((keys[nid], values[nid]))
+            nid = right[nid]
         return result
-    
-    def _inorder_recursive(self, node: Optional[AVLNode], result: List) -> None:
-        """Inorder traversal."""
-        if node:
-            self._inorder_recursive(node.left, result)
-            result.append((node.key, node.value))
-            self._inorder_recursive(node.right, result)
-
 
 # Example usage
 if __name__ == "__main__":
@@ -267,6 +470,21 @@ if __name__ == "__main__":
     print(f"   Height: {avl._get_height(avl.root)} (balanced!)")
     print(f"   Search 5: {avl.search(5)}")
     
+    # Same tree, Structure-of-Arrays layout
+    print("\n🧮 Array AVL Tree (Structure-of-Arrays):")
+    soa = ArrayAVLTree()
+    for i in [1, 2, 3, 4, 5, 6, 7]:
+        soa.insert(i, f"value_{i}")
+    
+    print(f"   Height: {soa.height()} (same shape, no node objects)")
+    print(f"   Search 5: {soa.search(5)}")
+    
+    # Sorted input: build balanced in one pass, no rotations
+    print("\n📦 AVL bulk load (1000 sorted keys):")
+    bulk = AVLTree()
+    bulk.bulk_load([(k, f"value_{k}") for k in range(1000)])
+    print(f"   Height: {bulk._get_height(bulk.root)} (minimum possible)")
+    
     print("\n💡 Key Difference:")
     print(f"   BST: Height = {bst.height()} (O(n) worst case)")
     print(f"   AVL: Height = {avl._get_height(avl.root)} (O(log n) guaranteed)")
@@ -3,6 +3,8 @@ Episode 5: B-Trees - Disk-Optimized Data Structures
 100+ keys per node = fewer disk seeks!
 """
 
+from array import array
+from bisect import bisect_left, bisect_right
 from typing import Optional, List, Tuple, Any
 
 
@@ -14,10 +16,15 @@ class BTreeNode:
     - Contains multiple keys (not just 1 like BST)
     - All leaves at same level
     - Minimizes disk I/O
+    
+    Keys are packed int64s (array 'q'): 8 bytes each instead of a
+    boxed int + list pointer, like keys laid out in a real disk page.
     """
     
-    def __init__(self, is_leaf: bool = True):
-        self.keys: List[int] = []
+    __slots__ = ('keys', 'values', 'children', 'is_leaf')  # No per-node __dict__
+    
+    def __init__(self, is_leaf: bool = True) -> None:
+        self.keys = array('q')
         self.values: List[Any] = []
         self.children: List['BTreeNode'] = []
         self.is_leaf = is_leaf
@@ -39,7 +46,7 @@ class BTree:
     Used by: PostgreSQL, MySQL InnoDB, SQLite
     """
     
-    def __init__(self, order: int = 5):
+    def __init__(self, order: int = 5) -> None:
         """
         Args:
             order: Maximum number of children per node
@@ -47,6 +54,7 @@ class BTree:
         """
         self.root = BTreeNode()
         self.order = order
+        self.max_keys = order - 1  # Split threshold, fixed for the tree's life
         self.size = 0
     
     def search(self, key: int) -> Optional[Any]:
@@ -57,24 +65,20 @@ class BTree:
         - Height = log₁₀₀(1,000,000) ≈ 3
         - Disk seeks = 3 (vs 20 in BST!)
         """
-        return self._search_recursive(self.root, key)
-    
-    def _search_recursive(self, node: BTreeNode, key: int) -> Optional[Any]:
-        """Search recursively through tree."""
-        # Binary search within node
-        i = 0
-        while i < len(node.keys) and key > node.keys[i]:
-            i += 1
-        
-        # Found key
-        if i < len(node.keys) and key == node.keys[i]:
-            return node.values[i]
-        
-        # Key not found, search children if not leaf
-        if node.is_leaf:
-            return None
-        else:
-            return self._search_recursive(node.children[i], key)
+        node = self.root
+        while True:
+            # Binary search within node: O(log k), runs in C
+            keys = node.keys
+            i = bisect_left(keys, key)
+            
+            # Found key
+            if i < len(keys) and keys[i] == key:
+                return node.values[i]
+            
+            # Key not found, descend into child if not leaf
+            if node.is_leaf:
+                return None
+            node = node.children[i]
     
     def insert(self, key: int, value: Any) -> None:
         """
@@ -82,46 +86,56 @@ class BTree:
         May cause splits to maintain B-Tree properties.
         """
         root = self.root
+        max_keys = self.max_keys
         
         # If root is full, split it
-        if root.is_full(self.order):
+        if len(root.keys) >= max_keys:
             new_root = BTreeNode(is_leaf=False)
-            new_root.children.append(self.root)
+            new_root.children.append(root)
             self._split_child(new_root, 0)
             self.root = new_root
         
-        self._insert_non_full(self.root, key, value)
-        self.size += 1
+        if self._insert_non_full(self.root, key, value, max_keys):
+            self.size += 1
     
-    def _insert_non_full(self, node: BTreeNode, key: int, value: Any) -> None:
-        """Insert into node that is not full."""
-        i = len(node.keys) - 1
+    def _insert_non_full(self, node: BTreeNode, key: int, value: Any,
+                         max_keys: int) -> bool:
+        """
+        Insert into node that is not full.
         
-        if node.is_leaf:
-            # Insert in leaf node
-            node.keys.append(None)
-            node.values.append(None)
-            
-            while i >= 0 and key < node.keys[i]:
-                node.keys[i + 1] = node.keys[i]
-                node.values[i + 1] = node.values[i]
-                i -= 1
+        max_keys is passed down so the "is child full?" test is an inline
+        len() comparison rather than a method call + attribute lookup.
+        
+        Returns False if the key already existed (value updated in place).
+        
+        Iterative: full children are split on the way down (proactive
+        splitting), so there is never a need to walk back up the tree.
+        """
+        while True:
+            # Binary search in C instead of a Python shift loop
+            keys = node.keys
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                node.values[i] = value  # Update existing key
+                return False
             
-            node.keys[i + 1] = key
-            node.values[i + 1] = value
-        else:
-            # Find child to insert into
-            while i >= 0 and key < node.keys[i]:
-                i -= 1
-            i += 1
+            if node.is_leaf:
+                # Insert in leaf node (list.insert shifts with memmove)
+                keys.insert(i, key)
+                node.values.insert(i, value)
+                return True
             
             # Split child if full
-            if node.children[i].is_full(self.order):
+            if len(node.children[i].keys) >= max_keys:
                 self._split_child(node, i)
-                if key > node.keys[i]:
+                median = node.keys[i]
+                if key == median:
+                    node.values[i] = value  # Median that moved up was our key
+                    return False
+                if key > median:
                     i += 1
             
-            self._insert_non_full(node.children[i], key, value)
+            node = node.children[i]
     
     def _split_child(self, parent: BTreeNode, index: int) -> None:
         """
@@ -131,7 +145,6 @@ class BTree:
         - Median key moves up to parent
         - Node splits into two half-full nodes
         """
-        order = self.order
         child = parent.children[index]
         new_child = BTreeNode(is_leaf=child.is_leaf)
         
@@ -154,38 +167,116 @@ class BTree:
             new_child.children = child.children[mid + 1:]
             child.children = child.children[:mid + 1]
     
+    def bulk_load(self, pairs: List[Tuple[int, Any]]) -> None:
+        """
+        Build the tree bottom-up from (key, value) pairs sorted by key.
+        
+        One linear pass instead of n inserts that each re-descend and
+        split: O(n) vs O(n log n). Leaves are packed ~75% full, leaving
+        room for later inserts before the first split. Each parent level
+        is then built from the one below, promoting the key between two
+        neighbouring groups as their separator.
+        
+        Mirrors PostgreSQL's sorted CREATE INDEX build. Replaces any
+        existing contents.
+        """
+        if any(a[0] >= b[0] for a, b in zip(pairs, pairs[1:])):
+            raise ValueError("bulk_load() needs pairs sorted by unique key")
+        
+        n = len(pairs)
+        self.root = BTreeNode()
+        self.size = n
+        if n == 0:
+            return
+        fill = max(2, self.max_keys * 3 // 4)
+        
+        # Leaf level: count leaves hold n - (count - 1) keys, the rest go up
+        count = -(-(n + 1) // (fill + 1))
+        q, r = divmod(n - (count - 1), count)
+        nodes: List[BTreeNode] = []
+        seps: List[Tuple[int, Any]] = []
+        pos = 0
+        for j in range(count):
+            take = q + (j < r)
+            leaf = BTreeNode()
+            leaf.keys = array('q', [k for k, _ in pairs[pos:pos + take]])
+            leaf.values = [v for _, v in pairs[pos:pos + take]]
+            nodes.append(leaf)
+            pos += take
+            if j < count - 1:
+                seps.append(pairs[pos])  # Separator between leaf j and j+1
+                pos += 1
+        
+        # Internal levels: seps[i] sits between nodes[i] and nodes[i + 1]
+        while len(nodes) > 1:
+            m = len(nodes)
+            count = -(-m // (fill + 1))
+            q, r = divmod(m, count)
+            parents: List[BTreeNode] = []
+            up: List[Tuple[int, Any]] = []
+            pos = 0
+            for j in range(count):
+                take = q + (j < r)
+                parent = BTreeNode(is_leaf=False)
+                parent.children = nodes[pos:pos + take]
+                parent.keys = array('q', [k for k, _ in seps[pos:pos + take - 1]])
+                parent.values = [v for _, v in seps[pos:pos + take - 1]]
+                parents.append(parent)
+                if j < count - 1:
+                    up.append(seps[pos + take - 1])
+                pos += take
+            nodes, seps = parents, up
+        
+        self.root = nodes[0]
+    
     def range_scan(self, start_key: int, end_key: int) -> List[Tuple[int, Any]]:
         """
         Range query: Find all keys in [start_key, end_key].
         
         Without B+Tree optimization: Need to traverse entire tree
         With B+Tree: Leaves are linked, just walk the linked list!
+        
+        Iterative in-order walk: the stack holds (node, i) resumption
+        points meaning "child i is done, emit key i next".
         """
-        results = []
-        self._range_scan_recursive(self.root, start_key, end_key, results)
-        return results
-    
-    def _range_scan_recursive(self, node: BTreeNode, start: int, end: int, results: List) -> None:
-        """Collect keys in range."""
-        i = 0
+        results: List[Tuple[int, Any]] = []
+        stack: List[Tuple[BTreeNode, int]] = []
         
-        while i < len(node.keys):
-            if node.is_leaf:
-                # Leaf node: Check if key in range
-                if start <= node.keys[i] <= end:
-                    results.append((node.keys[i], node.values[i]))
-                elif node.keys[i] > end:
+        # Descend to the first key >= start_key
+        node = self.root
+        i = bisect_left(node.keys, start_key)
+        while not node.is_leaf:
+            stack.append((node, i))
+            node = node.children[i]
+            i = bisect_left(node.keys, start_key)
+        
+        while True:
+            # Emit the in-range slice of this leaf
+            keys = node.keys
+            j = bisect_right(keys, end_key, i)
+            results.extend(zip(keys[i:j], node.values[i:j]))
+            if j < len(keys):
+                return results  # Passed end_key
+            
+            # Leaf exhausted: pop up to the next separator key
+            while stack:
+                parent, k = stack.pop()
+                if k < len(parent.keys):
+                    key = parent.keys[k]
+                    if key > end_key:
+                        return results
+                    results.append((key, parent.values[k]))
+                    stack.append((parent, k + 1))
+                    
+                    # Then the leftmost leaf of the next child
+                    node = parent.children[k + 1]
+                    while not node.is_leaf:
+                        stack.append((node, 0))
+                        node = node.children[0]
+                    i = 0
                     break
-                i += 1
             else:
-                # Internal node: Recurse on appropriate children
-                if start <= node.keys[i]:
-                    self._range_scan_recursive(node.children[i], start, end, results)
-                i += 1
-        
-        # Visit rightmost child if not leaf
-        if not node.is_leaf and i < len(node.children):
-            self._range_scan_recursive(node.children[i], start, end, results)
+                return results
 
 
 class BPlusTreeNode:
@@ -193,7 +284,9 @@ class BPlusTreeNode:
     B+Tree Node (linked leaves for fast range scans).
     """
     
-    def __init__(self, is_leaf: bool = True):
+    __slots__ = ('keys', 'is_leaf', 'values', 'next', 'children')
+    
+    def __init__(self, is_leaf: bool = True) -> None:
         self.keys: List[int] = []
         self.is_leaf = is_leaf
         
@@ -232,6 +325,11 @@ if __name__ == "__main__":
     for key, value in results:
         print(f"   {key}: {value}")
     
+    print(f"\n📦 Bulk-loading 1000 sorted keys (no splits)...")
+    bulk = BTree(order=5)
+    bulk.bulk_load([(k, f"value_{k}") for k in range(1000)])
+    print(f"   Size: {bulk.size} keys, range [500, 503]: {bulk.range_scan(500, 503)}")
+    
     print("\n💡 Why B-Trees Beat BST for Databases:")
     print("   1. High fanout: log₁₀₀(1M) = 3 vs log₂(1M) = 20")
     print("   2. Disk I/O: 3 seeks vs 20 seeks")
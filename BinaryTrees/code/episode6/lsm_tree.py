@@ -4,58 +4,199 @@ Append-only = 100× faster writes!
 """
 
 import heapq
-from typing import List, Tuple, Optional, Any, Dict
+import math
+import struct
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from itertools import repeat
+from typing import List, Tuple, Optional, Any, Dict, Iterable
+
+# Delete marker. Always stored as this one object, so checks are `is`
+# (a pointer compare) rather than a 13-byte memcmp.
+_TOMBSTONE = b'__TOMBSTONE__'
+
+# SSTable record header: key length, value length (key, value bytes follow)
+_SSTREC = struct.Struct('<II')
 
 
 class MemTable:
     """
     In-memory write buffer (SkipList in production).
     Sorted structure for fast inserts and scans.
+    
+    Keys are kept sorted as they arrive (dict for point lookups plus a
+    sorted key list), so a flush is an O(n) walk instead of a sort.
     """
     
     def __init__(self, max_size: int = 1000):
         self.data: Dict[bytes, bytes] = {}
+        self.keys: List[bytes] = []  # Sorted
         self.max_size = max_size
+        self._full = False  # Set once, when the max_size-th key arrives
     
     def put(self, key: bytes, value: bytes) -> None:
         """Insert key-value pair."""
-        self.data[key] = value
+        data = self.data
+        if key not in data:
+            keys = self.keys
+            # Append hint (RocksDB InsertWithHint): ascending keys are O(1)
+            if not keys or key > keys[-1]:
+                keys.append(key)
+            else:
+                insort(keys, key)
+            if len(keys) >= self.max_size:
+                self._full = True
+        data[key] = value
     
     def get(self, key: bytes) -> Optional[bytes]:
         """Get value for key."""
         return self.data.get(key)
     
     def is_full(self) -> bool:
-        """Check if memtable needs flushing."""
-        return len(self.data) >= self.max_size
+        """Check if memtable needs flushing (a flag read, no len())."""
+        return self._full
     
     def to_sstable(self) -> 'SSTable':
-        """Flush to immutable SSTable."""
-        sorted_items = sorted(self.data.items())
-        return SSTable(sorted_items)
+        """
+        Flush to immutable SSTable (keys already sorted).
+        
+        One pass builds the values column and the packed on-disk
+        records together.
+        """
+        data = self.data
+        builder = SSTableBuilder()
+        add = builder.add
+        for key in self.keys:
+            add(key, data[key])
+        return builder.finish()
 
 
 class SSTable:
     """
     Sorted String Table - Immutable on-disk file.
     Once written, never modified (append-only).
+    
+    Stored as two parallel sorted lists (keys, values) like the
+    on-disk layout: no hash table, and scans read both sequentially.
+    The packed file image travels alongside, ready to write out.
     """
     
-    def __init__(self, data: List[Tuple[bytes, bytes]]):
-        self.data = dict(data)  # In production: write to disk file
-        self.keys = sorted(self.data.keys())  # For binary search
+    def __init__(self, keys: List[bytes], values: List[bytes], blob: bytes):
+        """
+        Built by SSTableBuilder (keys must be non-empty).
+        
+        Args:
+            keys: Sorted unique keys
+            values: Values aligned with keys
+            blob: The same records packed as (klen, vlen, key, value)
+        """
+        self.keys = keys
+        self.values = values
+        self.blob = blob  # In production: write to disk file
+        self.min_key = keys[0]
+        self.max_key = keys[-1]
+        
+        # Filter block: skip this file for keys it can't contain
+        self.bloom = BloomFilter.from_fpr(len(keys), 0.01)
+        self.bloom.bulk_add(keys)
+    
+    def to_bytes(self) -> bytes:
+        """Packed records, ready for a sequential disk write."""
+        return self.blob
     
     def get(self, key: bytes) -> Optional[bytes]:
         """Get value (binary search)."""
-        return self.data.get(key)
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return self.values[i]
+        return None
     
     def range_scan(self, start_key: bytes, end_key: bytes) -> List[Tuple[bytes, bytes]]:
-        """Scan range of keys."""
-        results = []
-        for key in self.keys:
-            if start_key <= key <= end_key:
-                results.append((key, self.data[key]))
-        return results
+        """Scan range of keys: O(log n + m) via binary search on sorted keys."""
+        lo = bisect_left(self.keys, start_key)
+        hi = bisect_right(self.keys, end_key, lo)
+        return list(zip(self.keys[lo:hi], self.values[lo:hi]))
+
+
+# --- Bloom kernels -----------------------------------------------------------
+# Hashing and bit tests fused into module-level functions over the raw
+# bytearray: no per-probe list, no attribute lookups, no method calls.
+# The low half of the 64-bit key hash picks a 512-bit block; a 128-bit
+# multiplicative remix supplies 9 bits (0..511) per probe within it.
+# (Ints and a byte buffer in, bool out: the shape numba.njit compiles.)
+
+_BLOOM_MIX = 0x9E3779B97F4A7C15F39CC0605CEDC835
+_BLOOM_SEED = 0x9E3779B9
+
+
+def _bloom_hash(key: bytes) -> int:
+    """
+    Deterministic 64-bit key hash: two seeded CRC32s (C speed).
+    
+    Builtin hash() is salted per process, so a filter built with it
+    could never be persisted next to its SSTable.
+    """
+    return zlib.crc32(key) | zlib.crc32(key, _BLOOM_SEED) << 32
+
+
+def _bloom_add(bits: bytearray, num_blocks: int, k: int, h: int) -> None:
+    base = (h & 0xFFFFFFFF) % num_blocks * 512
+    x = (h * _BLOOM_MIX) >> 56
+    for _ in range(k):
+        i = base + (x & 511)
+        bits[i >> 3] |= 1 << (i & 7)
+        x >>= 9
+
+
+def _bloom_add_many(bits: bytearray, num_blocks: int, k: int, hashes: Iterable[int]) -> None:
+    # Whole key batch in one call: the same loop as _bloom_add, inlined
+    for h in hashes:
+        base = (h & 0xFFFFFFFF) % num_blocks * 512
+        x = (h * _BLOOM_MIX) >> 56
+        for _ in range(k):
+            i = base + (x & 511)
+            bits[i >> 3] |= 1 << (i & 7)
+            x >>= 9
+
+
+def _bloom_query(bits: bytearray, num_blocks: int, k: int, h: int) -> bool:
+    base = (h & 0xFFFFFFFF) % num_blocks * 512
+    x = (h * _BLOOM_MIX) >> 56
+    for _ in range(k):
+        i = base + (x & 511)
+        if not bits[i >> 3] & (1 << (i & 7)):
+            return False  # Any clear bit: definitely not here
+        x >>= 9
+    return True
+
+
+class SSTableBuilder:
+    """
+    Streams sorted records into an SSTable in one pass: the key/value
+    columns and the packed (klen, vlen, key, value) records are built
+    together as records arrive.
+    
+    Records are not compressed: reads are served from the in-memory
+    columns, so compressed blocks would only add CPU and RAM.
+    """
+    
+    def __init__(self) -> None:
+        self.keys: List[bytes] = []
+        self.values: List[bytes] = []
+        self._blob = bytearray()
+    
+    def add(self, key: bytes, value: bytes) -> None:
+        """Append a record (keys must arrive in ascending order)."""
+        self.keys.append(key)
+        self.values.append(value)
+        blob = self._blob
+        blob += _SSTREC.pack(len(key), len(value))
+        blob += key
+        blob += value
+    
+    def finish(self) -> SSTable:
+        return SSTable(self.keys, self.values, bytes(self._blob))
 
 
 class BloomFilter:
@@ -64,28 +205,58 @@ class BloomFilter:
     
     False positive rate: ~1% with 10 bits per key
     Saves 99% of unnecessary SSTable lookups
+    
+    Bits are packed 8 per byte in a bytearray (a list of bools costs
+    an 8-byte pointer per bit).
+    
+    Split-block layout (Parquet/Kudu SBBF): the bits are cut into
+    64-byte blocks, one CPU cache line each. A key hashes to a single
+    block and sets k bits within it, so a probe touches 1 cache line
+    instead of k scattered ones.
+    
+    Sized RocksDB-style from a target false positive rate:
+    m = -n ln(p) / ln(2)^2 bits and k = (m/n) ln(2) probes.
     """
     
-    def __init__(self, size: int = 1000):
-        self.size = size
-        self.bits = [False] * size
+    BLOCK_BITS = 512  # One 64-byte cache line
+    
+    def __init__(self, expected_items: int = 100, fpp: float = 0.01):
+        """
+        Args:
+            expected_items: Number of keys the filter will hold
+            fpp: Target false positive probability
+        """
+        if not 0 < fpp < 1:
+            raise ValueError(f"fpp must be in (0, 1), got {fpp}")
+        # Classic optimum m = -n ln(p) / ln(2)^2, plus ~10% to make up
+        # for the uneven load across blocks
+        n = max(expected_items, 1)
+        bits = -n * math.log(fpp) / math.log(2) ** 2 * 1.1
+        self.num_blocks = max(1, math.ceil(bits / self.BLOCK_BITS))
+        self.bits = bytearray(self.num_blocks * self.BLOCK_BITS // 8)
+        # Optimal probe count (capped: one hash yields 8 in-block positions)
+        self.k = min(8, max(1, round(bits / n * math.log(2))))
+    
+    @classmethod
+    def from_fpr(cls, n: int, p: float = 0.01) -> 'BloomFilter':
+        """Filter for n keys at false positive rate p."""
+        return cls(expected_items=n, fpp=p)
     
     def add(self, key: bytes) -> None:
         """Add key to filter."""
-        for i in self._hash_functions(key):
-            self.bits[i] = True
+        _bloom_add(self.bits, self.num_blocks, self.k, _bloom_hash(key))
+    
+    def bulk_add(self, keys: Iterable[bytes]) -> None:
+        """Add a batch of keys in one kernel call."""
+        _bloom_add_many(self.bits, self.num_blocks, self.k, map(_bloom_hash, keys))
     
     def might_contain(self, key: bytes) -> bool:
         """Check if key MIGHT be in set."""
-        return all(self.bits[i] for i in self._hash_functions(key))
-    
-    def _hash_functions(self, key: bytes) -> List[int]:
-        """Multiple hash functions for Bloom filter."""
-        # Simplified: In production use MurmurHash, etc.
-        h1 = hash(key) % self.size
-        h2 = hash(key[::-1]) % self.size
-        h3 = (hash(key) * 31) % self.size
-        return [h1, h2, h3]
+        return _bloom_query(self.bits, self.num_blocks, self.k, _bloom_hash(key))
+    
+    def might_contain_hash(self, h: int) -> bool:
+        """might_contain() for a key already hashed with _bloom_hash()."""
+        return _bloom_query(self.bits, self.num_blocks, self.k, h)
 
 
 class LSMTree:
@@ -94,26 +265,40 @@ class LSMTree:
     
     Write path: O(1)
     1. Write to memtable (in-memory)
-    2. When full, flush to SSTable (sequential write!)
+    2. When full, flush to SSTable in L0 (sequential write!)
     
-    Read path: O(k) where k = number of SSTables
+    Read path: memtable, then each L0 SSTable, then one SSTable per level
     1. Check memtable
-    2. Check SSTable 1 (most recent)
-    3. Check SSTable 2
-    ...
-    N. Background compaction merges SSTables
+    2. Check L0 SSTables (newest first, key ranges overlap)
+    3. Check L1, L2, ... (one candidate each: ranges don't overlap)
+    
+    Leveled compaction (LevelDB/RocksDB): when L0 collects
+    L0_COMPACTION_TRIGGER files they are merged into the overlapping
+    part of L1; when level n outgrows its budget (SIZE_RATIO× the level
+    above), one of its files is merged down into level n+1. Each merge
+    only rewrites the overlapping key range, never the whole tree.
     
     Used by: Cassandra, RocksDB, LevelDB, HBase
     """
     
+    L0_COMPACTION_TRIGGER = 4  # L0 files before merging into L1
+    SIZE_RATIO = 10            # Level n+1 holds 10× the keys of level n
+    
     def __init__(self, memtable_size: int = 100):
         self.memtable = MemTable(max_size=memtable_size)
-        self.sstables: List[SSTable] = []
-        self.bloom_filters: List[BloomFilter] = []
+        # levels[0]: overlapping SSTables, oldest first
+        # levels[n >= 1]: non-overlapping SSTables sorted by min_key
+        self.levels: List[List[SSTable]] = [[]]
+        self._level_min_keys: List[List[bytes]] = [[]]  # Fence keys per level
         
         self.write_count = 0
         self.read_count = 0
     
+    @property
+    def sstables(self) -> List[SSTable]:
+        """All SSTables, oldest data first."""
+        return [sstable for level in reversed(self.levels) for sstable in level]
+    
     def put(self, key: bytes, value: bytes) -> None:
         """
         Write to LSM-Tree (blazing fast!).
@@ -137,7 +322,7 @@ class LSMTree:
         
         Must check:
         1. Memtable (fast)
-        2. All SSTables (potentially slow)
+        2. L0 SSTables, then at most one SSTable per deeper level
         
         Optimization: Bloom filters skip SSTables that don't contain key
         """
@@ -146,17 +331,37 @@ class LSMTree:
         # Check memtable first
         value = self.memtable.get(key)
         if value is not None:
-            return value
+            return None if value is _TOMBSTONE else value
         
-        # Check SSTables (newest first)
-        for sstable, bloom in zip(reversed(self.sstables), reversed(self.bloom_filters)):
+        # Hash once: every filter probed below reuses it
+        h = _bloom_hash(key)
+        
+        # L0 (newest first): index walk, no iterator objects
+        level0 = self.levels[0]
+        for i in range(len(level0) - 1, -1, -1):
+            sstable = level0[i]
             # Bloom filter: Skip if key definitely not here
-            if not bloom.might_contain(key):
+            if not sstable.bloom.might_contain_hash(h):
+                continue
+            
+            value = sstable.get(key)
+            if value is not None:
+                return None if value is _TOMBSTONE else value
+        
+        # L1+: binary search the level's fence keys for the one candidate
+        levels = self.levels
+        level_min_keys = self._level_min_keys
+        for n in range(1, len(levels)):
+            i = bisect_right(level_min_keys[n], key) - 1
+            if i < 0:
+                continue
+            sstable = levels[n][i]
+            if key > sstable.max_key or not sstable.bloom.might_contain_hash(h):
                 continue
             
             value = sstable.get(key)
             if value is not None:
-                return value
+                return None if value is _TOMBSTONE else value
         
         return None
     
@@ -165,76 +370,137 @@ class LSMTree:
         Delete = write tombstone marker.
         Actual deletion during compaction.
         """
-        self.memtable.put(key, b'__TOMBSTONE__')
+        self.memtable.put(key, _TOMBSTONE)
     
     def _flush_memtable(self) -> None:
         """
         Flush memtable to immutable SSTable.
         
         Steps:
-        1. Convert memtable → SSTable
+        1. Convert memtable → SSTable (with its Bloom filter)
         2. Write to disk (sequential write - fast!)
-        3. Build Bloom filter
+        3. Add to L0, compact if L0 is full
         4. Clear memtable
         """
         print(f"📝 Flushing memtable ({len(self.memtable.data)} entries) to SSTable...")
         
         # Create SSTable
         sstable = self.memtable.to_sstable()
-        self.sstables.append(sstable)
-        
-        # Build Bloom filter
-        bloom = BloomFilter(size=len(sstable.data) * 10)
-        for key in sstable.keys:
-            bloom.add(key)
-        self.bloom_filters.append(bloom)
+        self.levels[0].append(sstable)
         
         # Clear memtable
         self.memtable = MemTable(max_size=self.memtable.max_size)
         
         print(f"✅ SSTable created. Total SSTables: {len(self.sstables)}")
+        
+        if len(self.levels[0]) >= self.L0_COMPACTION_TRIGGER:
+            self._compact_level(0)
     
-    def compact(self) -> None:
+    def _level_budget(self, n: int) -> int:
+        """Max keys level n (>= 1) may hold before it spills down."""
+        return (self.memtable.max_size * self.L0_COMPACTION_TRIGGER
+                * self.SIZE_RATIO ** (n - 1))
+    
+    def _set_level(self, n: int, sstables: List[SSTable]) -> None:
+        while len(self.levels) <= n:
+            self.levels.append([])
+            self._level_min_keys.append([])
+        self.levels[n] = sstables
+        self._level_min_keys[n] = [sstable.min_key for sstable in sstables]
+    
+    def _compact_level(self, n: int) -> None:
+        """
+        Merge level n into level n+1, then keep merging down the
+        shallowest level that is over budget until none is.
+        
+        L0 goes down whole (its files overlap each other); deeper levels
+        send one file. Only the files of level n+1 whose key range
+        overlaps the input are rewritten.
+        """
+        while True:
+            if n == 0:
+                inputs = self.levels[0][::-1]  # Newest first
+                remaining: List[SSTable] = []
+            else:
+                inputs = self.levels[n][:1]
+                remaining = self.levels[n][1:]
+            lo = min(sstable.min_key for sstable in inputs)
+            hi = max(sstable.max_key for sstable in inputs)
+            
+            target = self.levels[n + 1] if n + 1 < len(self.levels) else []
+            overlap = [s for s in target if s.max_key >= lo and s.min_key <= hi]
+            keep = [s for s in target if s.max_key < lo or s.min_key > hi]
+            
+            # Tombstones can go once nothing older lies below the output
+            bottom = all(not level for level in self.levels[n + 2:])
+            print(f"🔄 Compacting L{n} → L{n + 1} "
+                  f"({len(inputs)} + {len(overlap)} SSTables)...")
+            merged = self._merge(inputs + overlap, drop_tombstones=bottom)
+            
+            self._set_level(n, remaining)
+            self._set_level(n + 1, sorted(keep + merged, key=lambda s: s.min_key))
+            
+            over = [m for m in range(1, len(self.levels))
+                    if sum(len(s.keys) for s in self.levels[m]) > self._level_budget(m)]
+            if not over:
+                return
+            n = over[0]
+    
+    def _merge(self, runs: List[SSTable], drop_tombstones: bool) -> List[SSTable]:
         """
-        Compaction: Merge SSTables (LeetCode #23 in production!).
+        K-way merge of runs (newest first) into non-overlapping SSTables
+        of about one memtable each.
         
-        This is literally "Merge K Sorted Lists"
+        This is literally "Merge K Sorted Lists" (LeetCode #23).
+        """
+        # Min heap streams (key, age, value), age 0 = newest,
+        # so the first entry seen for each key is its latest version
+        streams = [zip(sstable.keys, repeat(age), sstable.values)
+                   for age, sstable in enumerate(runs)]
+        target_keys = self.memtable.max_size
+        outputs: List[SSTable] = []
+        builder = SSTableBuilder()
+        last_key: Optional[bytes] = None
+        for key, _, value in heapq.merge(*streams):
+            if key == last_key:
+                continue  # Older version, newest already handled
+            last_key = key
+            if value is _TOMBSTONE and drop_tombstones:
+                continue
+            builder.add(key, value)
+            if len(builder.keys) >= target_keys:
+                outputs.append(builder.finish())
+                builder = SSTableBuilder()
+        if builder.keys:
+            outputs.append(builder.finish())
+        return outputs
+    
+    def compact(self) -> None:
+        """
+        Major compaction: merge every level into one sorted run.
         
         Steps:
         1. Take all SSTables
         2. Merge using k-way merge (min heap)
         3. Remove duplicates (keep newest)
         4. Remove tombstones
-        5. Write merged SSTable
+        5. Write the merged run to the bottom level
         """
-        if len(self.sstables) < 2:
+        runs = self.levels[0][::-1] + [s for level in self.levels[1:] for s in level]
+        if len(runs) < 2:
             return
         
-        print(f"\n🔄 Compacting {len(self.sstables)} SSTables...")
+        print(f"\n🔄 Compacting {len(runs)} SSTables...")
         
-        # K-way merge using heap
-        merged_data = {}
+        merged = self._merge(runs, drop_tombstones=True)
+        bottom = max(1, len(self.levels) - 1)
+        for n in range(bottom):
+            self._set_level(n, [])
+        self._set_level(bottom, merged)
         
-        # Collect all entries (newest wins)
-        for sstable in reversed(self.sstables):
-            for key, value in sstable.data.items():
-                if key not in merged_data and value != b'__TOMBSTONE__':
-                    merged_data[key] = value
-        
-        # Create one merged SSTable
-        items = sorted(merged_data.items())
-        compacted_sstable = SSTable(items)
-        
-        # Build new Bloom filter
-        bloom = BloomFilter(size=len(items) * 10)
-        for key, _ in items:
-            bloom.add(key)
-        
-        # Replace all SSTables with one
-        self.sstables = [compacted_sstable]
-        self.bloom_filters = [bloom]
-        
-        print(f"✅ Compaction complete! Merged into 1 SSTable ({len(items)} keys)")
+        total = sum(len(s.keys) for s in merged)
+        print(f"✅ Compaction complete! Merged into L{bottom} "
+              f"({len(merged)} SSTables, {total} keys)")
 
 
 # Example usage
@@ -268,7 +534,7 @@ if __name__ == "__main__":
     lsm.compact()
     
     print(f"\n📊 After compaction:")
-    print(f"   SSTables: {len(lsm.sstables)}")
+    print(f"   SSTables: {len(lsm.sstables)} (one sorted run in L{len(lsm.levels) - 1})")
     
     print("\n💡 LSM-Tree Advantages:")
     print("   ✅ Write throughput: 10,000+ writes/sec (vs 50 for B-Tree)")
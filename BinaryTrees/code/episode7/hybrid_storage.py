@@ -4,9 +4,12 @@ Hot data in B-Tree, cold data in LSM-Tree
 """
 
 from typing import Optional, Any, Dict, List
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import time
 
+# Delete marker. Always stored as this one object, so checks are `is`
+_TOMBSTONE = b'__TOMBSTONE__'
+
 
 class AccessTracker:
     """
@@ -15,30 +18,36 @@ class AccessTracker:
     Strategy:
     - Hot: Frequently accessed → B-Tree (fast reads)
     - Cold: Rarely accessed → LSM-Tree (space efficient)
+    
+    last_access is kept in LRU order (oldest first), so finding cold
+    keys only touches the keys that are actually cold.
     """
     
     def __init__(self, hot_threshold: int = 5):
         self.access_counts: Dict[bytes, int] = defaultdict(int)
-        self.last_access: Dict[bytes, float] = {}
+        self.last_access: 'OrderedDict[bytes, float]' = OrderedDict()
         self.hot_threshold = hot_threshold
     
     def record_access(self, key: bytes) -> None:
         """Record key access."""
         self.access_counts[key] += 1
         self.last_access[key] = time.time()
+        self.last_access.move_to_end(key)  # Most recent at the end
     
     def is_hot(self, key: bytes) -> bool:
         """Check if key is hot (frequently accessed)."""
         return self.access_counts[key] >= self.hot_threshold
     
     def get_cold_keys(self, age_threshold: float = 60.0) -> List[bytes]:
-        """Find keys that haven't been accessed recently."""
+        """Find keys that haven't been accessed recently: O(cold keys)."""
         current_time = time.time()
         cold_keys = []
         
+        # Oldest first: stop at the first key that is still warm
         for key, last_time in self.last_access.items():
-            if current_time - last_time > age_threshold:
-                cold_keys.append(key)
+            if current_time - last_time <= age_threshold:
+                break
+            cold_keys.append(key)
         
         return cold_keys
 
@@ -62,11 +71,8 @@ class SimpleBTree:
         self.data[key] = value
     
     def delete(self, key: bytes) -> bool:
-        """Delete key."""
-        if key in self.data:
-            del self.data[key]
-            return True
-        return False
+        """Delete key (one hash probe)."""
+        return self.data.pop(key, None) is not None
     
     def size(self) -> int:
         """Number of keys."""
@@ -94,13 +100,17 @@ class SimpleLSM:
     def delete(self, key: bytes) -> bool:
         """Delete via tombstone."""
         if key in self.data:
-            self.data[key] = b'__TOMBSTONE__'
+            self.data[key] = _TOMBSTONE
             return True
         return False
     
+    def pop(self, key: bytes) -> Optional[bytes]:
+        """Remove key outright (no tombstone) and return its value."""
+        return self.data.pop(key, None)
+    
     def size(self) -> int:
         """Number of keys."""
-        return len([k for k, v in self.data.items() if v != b'__TOMBSTONE__'])
+        return sum(1 for v in self.data.values() if v is not _TOMBSTONE)
 
 
 class HybridStorage:
@@ -191,9 +201,9 @@ class HybridStorage:
         """
         self.tier_promotions += 1
         
-        # Move to hot tier
+        # Move to hot tier (pop: lookup + removal in one probe)
+        self.cold_tier.pop(key)
         self.hot_tier.put(key, value)
-        self.cold_tier.delete(key)
         
         print(f"♨️  Promoted {key.decode()} to hot tier")
     
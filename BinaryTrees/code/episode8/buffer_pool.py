@@ -6,40 +6,108 @@ Disk is 100,000× slower than RAM!
 """
 
 import time
-from typing import Optional, Any, Dict, Set
-from collections import OrderedDict
+import heapq
+import atexit
+import threading
+from collections import defaultdict
+from typing import Optional, Any, Dict, List, Set, cast
+
+SIMULATED_IO_NS = 10_000  # 10 microseconds per I/O (10ms scaled down)
+
+
+def busy_wait_ns(ns: int) -> None:
+    """
+    Spin for ns nanoseconds.
+    
+    time.sleep() can't model microsecond latencies: every call is a
+    nanosleep syscall whose wakeup jitter (50µs+) swamps the delay.
+    """
+    deadline = time.perf_counter_ns() + ns
+    while time.perf_counter_ns() < deadline:
+        pass
 
 
 class BufferPool:
     """
-    Buffer Pool with LRU eviction policy.
+    Buffer Pool with (lazy) LRU eviction policy.
     
     Sits between Storage Engine and Disk:
     - Storage engine calls: buffer_pool.get_page(page_id)
     - Buffer pool decides: RAM cache hit OR disk read
     
+    Lazy LRU: a hit only stamps the page with a logical clock tick
+    (no list splicing). When the pool fills up, the oldest half is
+    evicted in one batch, so eviction cost is amortized O(1).
+    
+    Frames: page data lives in pooled bytearrays with segregated
+    free lists, one per power-of-two size class. Pages of any size
+    (overflow pages, WAL records, large objects) get a frame in O(1)
+    by popping their bucket, and evicted frames go back on it, so
+    page churn neither allocates nor fragments.
+    
+    Write-behind: an optional background thread (like PostgreSQL's
+    bgwriter) drains dirty pages whenever too many pile up, so writers
+    and checkpoints don't stall on I/O.
+    
     Used by: PostgreSQL (shared_buffers), MySQL (innodb_buffer_pool_size)
     """
     
-    def __init__(self, capacity_mb: int = 1024, page_size: int = 4096):
+    # Readahead tuning (RocksDB/Linux style: window doubles while scan
+    # continues, halves when prefetched pages are evicted unread)
+    READAHEAD_TRIGGER = 2   # Sequential misses before prefetching kicks in
+    READAHEAD_MIN = 16      # Initial window (pages)
+    READAHEAD_MAX = 256     # Window cap (pages)
+    
+    # Spare frames kept per size class (bounds RSS after a burst)
+    FREE_LIST_CAP = 256
+    
+    # Background writer tuning
+    WRITER_DIRTY_RATIO = 0.25  # Wake the writer above this dirty fraction
+    WRITER_BATCH = 64          # Pages written per writer round
+    
+    def __init__(self, capacity_mb: int = 1024, page_size: int = 4096,
+                 simulate_latency: bool = False):
         """
         Args:
             capacity_mb: Buffer pool size in megabytes
             page_size: Page size in bytes (typically 4KB or 8KB)
+            simulate_latency: Spin SIMULATED_IO_NS per disk I/O. Off by
+                default: the disk_reads/disk_writes counters already
+                measure the I/O a workload would do.
         """
         self.capacity = capacity_mb * 1024 * 1024 // page_size  # Pages
         self.page_size = page_size
+        self.simulate_latency = simulate_latency
         
-        # LRU cache: OrderedDict maintains insertion/access order
-        self.cache: OrderedDict[int, bytes] = OrderedDict()
+        # Segregated free lists: size class (2**k bytes) → spare frames (stack)
+        self._free: Dict[int, List[bytearray]] = defaultdict(list)
+        
+        # Lazy LRU cache: page_id → frame, plus page_id → last access tick
+        self.cache: Dict[int, memoryview] = {}
+        self.atime: Dict[int, int] = {}
+        self.clock = 0  # Logical clock, bumped on every access
         self.dirty_pages: Set[int] = set()  # Modified but not written
         
+        # Readahead: detect sequential misses and prefetch ahead
+        self._last_miss_pid = -1
+        self._seq_miss = 0
+        self._ra_size = self.READAHEAD_MIN
+        self._ra_unused: Set[int] = set()  # Prefetched, not yet accessed
+        
+        # Shared state is guarded by one lock; the writer sleeps on a condition
+        self._lock = threading.RLock()
+        self._dirty_cv = threading.Condition(self._lock)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_stop = False
+        self._in_flight: Set[int] = set()  # Pages the writer is writing out
+        
         # Statistics
         self.hits = 0
         self.misses = 0
         self.evictions = 0
         self.disk_reads = 0
         self.disk_writes = 0
+        self.prefetched = 0
     
     def get_page(self, page_id: int, disk_storage: Dict[int, bytes]) -> bytes:
         """
@@ -50,27 +118,48 @@ class BufferPool:
             disk_storage: Simulated disk storage
             
         Returns:
-            Page data
+            The page contents as immutable bytes: a copy, never a view of
+            the frame (frames are overwritten in place and recycled).
         """
-        # Check cache first
-        if page_id in self.cache:
-            self.hits += 1
-            # Move to end (most recently used)
-            self.cache.move_to_end(page_id)
-            return self.cache[page_id]  # ⚡ Cache hit: 100ns
+        with self._lock:
+            # Check cache first (single hash lookup on the hit path)
+            cache = self.cache
+            frame = cache.get(page_id)
+            if frame is not None:
+                self.hits += 1
+                # Stamp access time (no reordering needed)
+                self.atime[page_id] = self.clock
+                self.clock += 1
+                if self._ra_unused:
+                    self._ra_unused.discard(page_id)  # Readahead paid off
+                return bytes(frame)  # ⚡ Cache hit: 100ns
         
-        # Cache miss: Load from disk
-        self.misses += 1
-        self.disk_reads += 1
-        page_data = self._disk_read(page_id, disk_storage)  # 💥 Disk read: 10ms
+            # Cache miss: Load from disk
+            self.misses += 1
+            self.disk_reads += 1
+            page_data = self._disk_read(page_id, disk_storage)  # 💥 Disk read: 10ms
+        
+            # Evict oldest half in one batch if cache full
+            if len(cache) >= self.capacity:
+                self._evict_lru_pages(disk_storage)
+        
+            # Copy into a recycled frame
+            self._store_page(page_id, page_data)
+            self.atime[page_id] = self.clock
+            self.clock += 1
+        
+            # Sequential scan detection
+            if page_id == self._last_miss_pid + 1:
+                self._seq_miss += 1
+            else:
+                self._seq_miss = 0
+                self._ra_size = self.READAHEAD_MIN
+            self._last_miss_pid = page_id
         
-        # Evict LRU page if cache full
-        if len(self.cache) >= self.capacity:
-            self._evict_lru_page(disk_storage)
+            if self._seq_miss >= self.READAHEAD_TRIGGER:
+                self._prefetch(page_id + 1, page_id + self._ra_size, disk_storage)
         
-        # Add new page to cache
-        self.cache[page_id] = page_data
-        return page_data
+            return page_data
     
     def put_page(self, page_id: int, page_data: bytes) -> None:
         """
@@ -79,9 +168,37 @@ class BufferPool:
         Write-back strategy: Don't write to disk immediately.
         Batch writes for better performance.
         """
-        self.cache[page_id] = page_data
-        self.cache.move_to_end(page_id)
-        self.dirty_pages.add(page_id)
+        with self._lock:
+            self._store_page(page_id, page_data)
+            self.atime[page_id] = self.clock
+            self.clock += 1
+            self.dirty_pages.add(page_id)
+            
+            # Wake the background writer once the dirty watermark is crossed
+            if self._writer is not None and self._over_watermark():
+                self._dirty_cv.notify()
+    
+    def modify_page(self, page_id: int, offset: int, data: bytes) -> None:
+        """
+        Overwrite data at offset inside a cached page (mark as dirty).
+        
+        Zero-copy: the bytes land directly in the page's frame, so an
+        OLTP-style row update costs no new 4KB page object and no full
+        page memcpy. The page must be resident (get_page() it first).
+        """
+        with self._lock:
+            frame = self.cache[page_id]
+            end = offset + len(data)
+            if offset < 0 or end > len(frame):
+                raise ValueError(
+                    f"Write [{offset}, {end}) is outside page {page_id} ({len(frame)} bytes)")
+            frame[offset:end] = data
+            self.atime[page_id] = self.clock
+            self.clock += 1
+            self.dirty_pages.add(page_id)
+            
+            if self._writer is not None and self._over_watermark():
+                self._dirty_cv.notify()
     
     def flush_dirty_pages(self, disk_storage: Dict[int, bytes]) -> None:
         """
@@ -91,42 +208,208 @@ class BufferPool:
         - Checkpoint
         - Graceful shutdown
         - When dirty page ratio too high
+        
+        Pages are written in page_id order and contiguous runs are
+        coalesced into one write, turning random I/O into sequential I/O.
         """
-        print(f"\n💾 Flushing {len(self.dirty_pages)} dirty pages to disk...")
+        with self._lock:
+            print(f"\n💾 Flushing {len(self.dirty_pages)} dirty pages to disk...")
+            
+            pages = sorted(p for p in self.dirty_pages if p in self.cache)
+            
+            # Two-pointer sweep: [i, j) is a run of consecutive page_ids
+            i = 0
+            while i < len(pages):
+                j = i + 1
+                while j < len(pages) and pages[j] == pages[j - 1] + 1:
+                    j += 1
+                self._disk_write_run(pages[i:j], disk_storage)
+                i = j
+            
+            # In production: one fsync() here covers the whole batch
+            self.dirty_pages.clear()
+            
+            print(f"✅ Flush complete!")
+    
+    def start_background_writer(self, disk_storage: Dict[int, bytes]) -> None:
+        """
+        Start the write-behind thread.
+        
+        Whenever more than WRITER_DIRTY_RATIO of the pool is dirty, it
+        writes the lowest-numbered dirty pages in batches of WRITER_BATCH.
+        The thread is stopped (and the pool drained) at interpreter exit.
+        """
+        with self._lock:
+            if self._writer is not None:
+                return
+            self._writer_stop = False
+            self._writer = threading.Thread(
+                target=self._writer_loop, args=(disk_storage,), daemon=True)
+            self._writer.start()
+        atexit.register(self.stop_background_writer)
+    
+    def stop_background_writer(self) -> None:
+        """Stop the writer after it has written out all dirty pages."""
+        with self._dirty_cv:
+            writer = self._writer
+            if writer is None:
+                return
+            self._writer_stop = True
+            self._dirty_cv.notify()
+        writer.join()
+        self._writer = None
+        atexit.unregister(self.stop_background_writer)
+    
+    def _over_watermark(self) -> bool:
+        return len(self.dirty_pages) > self.capacity * self.WRITER_DIRTY_RATIO
+    
+    def _writer_loop(self, disk_storage: Dict[int, bytes]) -> None:
+        """Background writer: snapshot a batch under the lock, write it outside."""
+        cv = self._dirty_cv
+        while True:
+            with cv:
+                cv.wait_for(lambda: self._writer_stop or self._over_watermark())
+                if self._writer_stop and not self.dirty_pages:
+                    return
+                batch = heapq.nsmallest(self.WRITER_BATCH, self.dirty_pages)
+                cache = self.cache
+                snapshot = [(page_id, bytes(cache[page_id])) for page_id in batch]
+                self.dirty_pages.difference_update(batch)
+                self._in_flight.update(batch)
+            
+            # I/O happens without the lock: hits and misses carry on meanwhile
+            if self.simulate_latency:
+                busy_wait_ns(SIMULATED_IO_NS)
+            
+            with cv:
+                for page_id, data in snapshot:
+                    # An eviction or flush may have written a newer version
+                    if page_id in self._in_flight:
+                        disk_storage[page_id] = data
+                self._in_flight.difference_update(batch)
+                self.disk_writes += 1
+    
+    def _evict_lru_pages(self, disk_storage: Dict[int, bytes]) -> None:
+        """
+        Evict the least recently used half of the pool in one pass.
+        
+        If a victim page is dirty, or the background writer has taken it
+        but not stored it yet, write it back to disk first.
+        """
+        count = max(1, self.capacity // 2)
+        victims = heapq.nsmallest(count, self.atime.items(), key=lambda kv: kv[1])
         
-        for page_id in list(self.dirty_pages):
-            if page_id in self.cache:
-                self._disk_write(page_id, self.cache[page_id], disk_storage)
-                self.dirty_pages.remove(page_id)
+        # Prefetched pages evicted unread: readahead is outrunning the
+        # workload (e.g. a hot set, not a scan), so back the window off
+        ra_unused = self._ra_unused
+        if ra_unused:
+            wasted = sum(1 for victim_id, _ in victims if victim_id in ra_unused)
+            if wasted:
+                ra_unused.difference_update(victim_id for victim_id, _ in victims)
+                self._ra_size = max(self._ra_size // 2, self.READAHEAD_MIN)
         
-        print(f"✅ Flush complete!")
+        for victim_id, _ in victims:
+            frame = self.cache.pop(victim_id)
+            del self.atime[victim_id]
+            self.evictions += 1
+            
+            # Write back if dirty (or in flight: a miss could otherwise read
+            # the old disk copy before the writer stores its snapshot)
+            if victim_id in self.dirty_pages:
+                self._disk_write(victim_id, bytes(frame), disk_storage)
+                self.dirty_pages.remove(victim_id)
+            elif victim_id in self._in_flight:
+                self._disk_write(victim_id, bytes(frame), disk_storage)
+            
+            # Recycle the frame
+            self._release_frame(frame)
+    
+    def _alloc_frame(self, size: int) -> bytearray:
+        """Pop a frame from the size's power-of-two bucket (O(1), no search)."""
+        size_class = 1 << (max(size, 1) - 1).bit_length()
+        bucket = self._free[size_class]
+        if bucket:
+            return bucket.pop()
+        return bytearray(size_class)
+    
+    def _release_frame(self, frame: memoryview) -> None:
+        """Return a frame's buffer to its bucket (dropped if the bucket is full)."""
+        buf = cast(bytearray, frame.obj)
+        bucket = self._free[len(buf)]
+        if len(bucket) < self.FREE_LIST_CAP:
+            bucket.append(buf)
     
-    def _evict_lru_page(self, disk_storage: Dict[int, bytes]) -> None:
+    def _store_page(self, page_id: int, data: bytes) -> None:
+        """Copy page data into a pooled frame."""
+        n = len(data)
+        frame = self.cache.get(page_id)
+        if frame is not None:
+            if len(frame) == n:
+                frame[:] = data  # Same size: overwrite in place
+                return
+            self._release_frame(frame)
+        frame = memoryview(self._alloc_frame(n))[:n]
+        frame[:] = data
+        self.cache[page_id] = frame
+    
+    def _prefetch(self, start: int, end: int, disk_storage: Dict[int, bytes]) -> None:
         """
-        Evict least recently used page.
+        Read pages [start, end] into the cache with one sequential read.
         
-        If page is dirty, write it back to disk first.
+        The next miss of a continuing scan lands just past the window,
+        so it is treated as sequential and grows the window further.
         """
-        # Get LRU page (first item in OrderedDict)
-        victim_id, victim_data = self.cache.popitem(last=False)
-        self.evictions += 1
+        # Never prefetch more than half the pool (it would evict itself)
+        end = min(end, start + max(1, self.capacity // 2) - 1)
+        cache = self.cache
+        page_ids = [p for p in range(start, end + 1)
+                    if p in disk_storage and p not in cache]
+        if not page_ids:
+            return
+        
+        # In production: one large pread() or posix_fadvise(WILLNEED)
+        if self.simulate_latency:
+            busy_wait_ns(SIMULATED_IO_NS)
+        self.disk_reads += 1
         
-        # Write back if dirty
-        if victim_id in self.dirty_pages:
-            self._disk_write(victim_id, victim_data, disk_storage)
-            self.dirty_pages.remove(victim_id)
+        for page_id in page_ids:
+            if len(cache) >= self.capacity:
+                self._evict_lru_pages(disk_storage)
+            self._store_page(page_id, disk_storage[page_id])
+            self.atime[page_id] = self.clock
+            self.clock += 1
+        self.prefetched += len(page_ids)
+        self._ra_unused.update(page_ids)
+        
+        self._last_miss_pid = end
+        self._ra_size = min(self._ra_size * 2, self.READAHEAD_MAX)
     
     def _disk_read(self, page_id: int, disk_storage: Dict[int, bytes]) -> bytes:
         """Simulate disk read (10ms latency)."""
         # In production: fseek() + fread()
-        time.sleep(0.00001)  # 10 microseconds (scaled down)
+        if self.simulate_latency:
+            busy_wait_ns(SIMULATED_IO_NS)
         return disk_storage.get(page_id, b'\x00' * self.page_size)
     
     def _disk_write(self, page_id: int, data: bytes, disk_storage: Dict[int, bytes]) -> None:
         """Simulate disk write (10ms latency)."""
         # In production: fseek() + fwrite() + fsync()
-        time.sleep(0.00001)  # 10 microseconds (scaled down)
+        if self.simulate_latency:
+            busy_wait_ns(SIMULATED_IO_NS)
         disk_storage[page_id] = data
+        self._in_flight.discard(page_id)
+        self.disk_writes += 1
+    
+    def _disk_write_run(self, run: List[int], disk_storage: Dict[int, bytes]) -> None:
+        """Simulate one sequential write of consecutive pages (single seek)."""
+        # In production: one pwritev() covering run[0] .. run[-1]
+        if self.simulate_latency:
+            busy_wait_ns(SIMULATED_IO_NS)
+        cache = self.cache
+        for page_id in run:
+            disk_storage[page_id] = bytes(cache[page_id])
+        if self._in_flight:
+            self._in_flight.difference_update(run)
         self.disk_writes += 1
     
     def get_stats(self) -> Dict[str, Any]:
@@ -144,6 +427,7 @@ class BufferPool:
             'evictions': self.evictions,
             'disk_reads': self.disk_reads,
             'disk_writes': self.disk_writes,
+            'prefetched': self.prefetched,
         }
     
     def print_stats(self) -> None:
@@ -172,7 +456,7 @@ if __name__ == "__main__":
         disk_storage[i] = f"Page {i} data".encode().ljust(4096, b'\x00')
     
     # Access pages (first access = cache miss)
-    print(f"\n📖 Reading pages 0-99 (should cause cache misses)...")
+    print(f"\n📖 Reading pages 0-99 (first misses trigger sequential readahead)...")
     for i in range(100):
         data = buffer_pool.get_page(i, disk_storage)
     
@@ -188,8 +472,7 @@ if __name__ == "__main__":
     # Modify some pages (mark dirty)
     print(f"\n✏️  Modifying pages 10-19...")
     for i in range(10, 20):
-        new_data = f"Modified page {i}".encode().ljust(4096, b'\x00')
-        buffer_pool.put_page(i, new_data)
+        buffer_pool.modify_page(i, 0, f"Modified page {i}".encode())
     
     buffer_pool.print_stats()
     
@@ -198,6 +481,15 @@ if __name__ == "__main__":
     
     buffer_pool.print_stats()
     
+    # Write-behind: background thread drains dirty pages past the watermark
+    print(f"\n✏️  Modifying pages 0-99 with the background writer running...")
+    buffer_pool.start_background_writer(disk_storage)
+    for i in range(100):
+        buffer_pool.modify_page(i, 0, f"Rewritten page {i}".encode())
+    buffer_pool.stop_background_writer()  # Writes out whatever is left
+    
+    buffer_pool.print_stats()
+    
     # Access many pages to cause evictions
     print(f"\n📖 Reading pages 0-500 (will cause evictions)...")
     for i in range(500):
@@ -209,6 +501,7 @@ if __name__ == "__main__":
     print(f"   - Cache hit rate: {buffer_pool.hits / (buffer_pool.hits + buffer_pool.misses) * 100:.1f}%")
     print(f"   - Disk reads avoided: {buffer_pool.hits} (would be 10ms each!)")
     print(f"   - Evictions: {buffer_pool.evictions} (LRU pages removed)")
+    print(f"   - Pages prefetched: {buffer_pool.prefetched} (sequential readahead)")
     print(f"\n🎯 Production config examples:")
     print(f"   PostgreSQL: shared_buffers = 8GB (25% of RAM)")
     print(f"   MySQL: innodb_buffer_pool_size = 64GB (70-80% of RAM)")
@@ -68,12 +68,12 @@ def buffer_pool_example():
     # First read (cache miss)
     print("\n📖 First read of page 5 (should be cache MISS)...")
     data = buffer_pool.get_page(5, disk_storage)
-    print(f"   Read: {data[:20].decode()}...")
+    print(f"   Read: {bytes(data[:20]).decode()}...")
     
     # Second read (cache hit)
     print("\n📖 Second read of page 5 (should be cache HIT)...")
     data = buffer_pool.get_page(5, disk_storage)
-    print(f"   Read: {data[:20].decode()}...")
+    print(f"   Read: {bytes(data[:20]).decode()}...")
     
     # Stats
     buffer_pool.print_stats()
@@ -124,6 +124,8 @@ def wal_durability_example():
         # Create new WAL instance (simulating restart after crash)
         wal2 = WriteAheadLog(wal_file)
         wal2.recover(storage)
+        wal.close()
+        wal2.close()
         
         print(f"\n   Storage after recovery: {storage}")
         print(f"\n✅ Transaction 1's changes survived (product:1, product:2)")
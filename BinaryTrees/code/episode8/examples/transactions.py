@@ -4,6 +4,7 @@ Example: Transaction scenarios
 Demonstrates ACID transactions with commit and rollback.
 """
 
+import logging
 import sys
 sys.path.insert(0, '..')
 
@@ -168,6 +169,9 @@ def concurrent_transactions():
 
 
 if __name__ == "__main__":
+    # Show the manager's per-operation trace
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s", stream=sys.stdout)
+    
     # Run all scenarios
     simple_transaction()
     rollback_transaction()
@@ -4,8 +4,18 @@ Free List - Space Management and Page Recycling
 Prevents database from growing forever by reusing deleted pages.
 """
 
+import heapq
+import logging
+import struct
+import sys
 from typing import List, Set, Optional
 
+# Per-page allocate/free tracing: DEBUG, off by default
+logger = logging.getLogger(__name__)
+
+# Free page record: page_id, next_free_page_id (compiled once)
+_FREE_PAGE_FMT = struct.Struct('<II')
+
 
 class FreeList:
     """
@@ -18,10 +28,15 @@ class FreeList:
     When page is deleted:
     1. Add to free list
     2. Don't physically delete (can reuse later)
+    
+    Free pages are handed out lowest page_id first (min-heap), like
+    PostgreSQL's FSM: the file stays dense at the front and new data
+    lands in sequential order instead of wherever the last delete was.
     """
     
     def __init__(self):
-        self.free_pages: List[int] = []  # Stack of available page IDs
+        self.free_pages: List[int] = []  # Min-heap of available page IDs
+        self._free_set: Set[int] = set()  # Same IDs, for O(1) membership
         self.next_page_id: int = 0        # If free list empty, allocate new
         
     def allocate_page(self) -> int:
@@ -33,14 +48,15 @@ class FreeList:
         """
         if self.free_pages:
             # Recycle deleted page ♻️
-            page_id = self.free_pages.pop()
-            print(f"♻️  Recycling page {page_id}")
+            page_id = heapq.heappop(self.free_pages)
+            self._free_set.discard(page_id)
+            logger.debug("♻️  Recycling page %d", page_id)
             return page_id
         else:
             # Allocate brand new page
             page_id = self.next_page_id
             self.next_page_id += 1
-            print(f"🆕 Allocating new page {page_id}")
+            logger.debug("🆕 Allocating new page %d", page_id)
             return page_id
     
     def free_page(self, page_id: int) -> None:
@@ -49,9 +65,11 @@ class FreeList:
         
         Don't physically delete! Just mark as recyclable.
         """
-        if page_id not in self.free_pages:
-            self.free_pages.append(page_id)
-            print(f"🗑️  Freed page {page_id} (available for reuse)")
+        if page_id in self._free_set:
+            return  # Already free (double free)
+        self._free_set.add(page_id)
+        heapq.heappush(self.free_pages, page_id)
+        logger.debug("🗑️  Freed page %d (available for reuse)", page_id)
     
     def get_fragmentation(self) -> float:
         """
@@ -92,6 +110,7 @@ class FreeList:
         
         # Reset free list
         self.free_pages.clear()
+        self._free_set.clear()
         self.next_page_id = new_page_id
         
         fragmentation_before = self.get_fragmentation()
@@ -120,19 +139,19 @@ class FreeListPage:
     
     def serialize(self) -> bytes:
         """Serialize to first 8 bytes of page."""
-        import struct
-        return struct.pack('II', self.page_id, self.next_free_page_id or 0)
+        return _FREE_PAGE_FMT.pack(self.page_id, self.next_free_page_id or 0)
     
     @staticmethod
     def deserialize(data: bytes) -> 'FreeListPage':
         """Deserialize from first 8 bytes."""
-        import struct
-        page_id, next_id = struct.unpack('II', data[:8])
+        page_id, next_id = _FREE_PAGE_FMT.unpack_from(data, 0)
         return FreeListPage(page_id, next_id if next_id != 0 else None)
 
 
 # Example usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s", stream=sys.stdout)
+    
     print("=" * 60)
     print("Free List Demo")
     print("=" * 60)
@@ -7,8 +7,11 @@ This module implements three types of storage engines:
 3. HybridStorage - Best of both worlds (TiDB style)
 """
 
+import heapq
 import json
-from typing import Any, Optional, List, Tuple
+from bisect import bisect_left, bisect_right, insort
+from itertools import repeat
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, List, Tuple
 
 
 class BTreeStorage:
@@ -19,11 +22,16 @@ class BTreeStorage:
     - Fast reads: O(log n) seeks
     - Slower writes: Read-modify-write on every insert
     - Used by: PostgreSQL, MySQL InnoDB, SQLite
+    
+    Keys are also kept as a sorted list (the "leaf level") so range and
+    prefix scans binary-search to their start instead of sorting or
+    walking the whole dict.
     """
     
     def __init__(self):
         self.data = {}  # Simplified: page_id → data
         self.root_page_id = 0
+        self._keys: List[bytes] = []  # Sorted, updated on put/delete of a key
         
     def put(self, key: bytes, value: bytes) -> None:
         """
@@ -37,6 +45,8 @@ class BTreeStorage:
         Total: 20ms per write
         """
         # Simplified implementation
+        if key not in self.data:
+            insort(self._keys, key)  # O(log n) search + memmove, no re-sort
         self.data[key] = value
     
     def get(self, key: bytes) -> Optional[bytes]:
@@ -54,6 +64,8 @@ class BTreeStorage:
         """Delete key from B-Tree."""
         if key in self.data:
             del self.data[key]
+            keys = self._keys
+            del keys[bisect_left(keys, key)]
     
     def scan_range(self, start_key: bytes, end_key: bytes) -> List[Tuple[bytes, bytes]]:
         """
@@ -65,22 +77,74 @@ class BTreeStorage:
         3. Stop at end_key
         
         This is why B+Trees are perfect for range queries.
+        
+        O(log n + k): two bisects, then only the k keys in range.
         """
-        results = []
-        for key in sorted(self.data.keys()):
-            if start_key <= key <= end_key:
-                results.append((key, self.data[key]))
-        return results
+        keys = self._keys
+        lo = bisect_left(keys, start_key)
+        hi = bisect_right(keys, end_key, lo)
+        data = self.data
+        return [(key, data[key]) for key in keys[lo:hi]]
     
     def scan_prefix(self, prefix: bytes) -> List[Tuple[bytes, bytes]]:
-        """Scan all keys with given prefix."""
+        """Scan all keys with given prefix (in key order)."""
+        keys = self._keys
+        data = self.data
         results = []
-        for key, value in self.data.items():
-            if key.startswith(prefix):
-                results.append((key, value))
+        # Keys sharing a prefix are contiguous in sorted order
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            key = keys[i]
+            if not key.startswith(prefix):
+                break
+            results.append((key, data[key]))
         return results
 
 
+class SSTable(NamedTuple):
+    """
+    Immutable sorted run, struct-of-arrays: keys[i] ↔ values[i].
+    
+    Point lookups bisect keys only (values aren't touched on a miss);
+    range scans are one bisect pair plus a slice. None values are
+    tombstones.
+    
+    No Bloom filter: LSMStorage's key → newest-run index already answers
+    misses exactly, so a filter per run would only add flush cost.
+    """
+    keys: List[bytes]
+    values: List[Optional[bytes]]
+    
+    def get(self, key: bytes) -> Tuple[bool, Optional[bytes]]:
+        """(found, value): found with value None means a tombstone."""
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return True, self.values[i]
+        return False, None
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+_MISSING: Any = object()  # dict.get() default: None already means tombstone
+
+
+def _merge_runs(sources: List[Iterable[Tuple[bytes, int, Optional[bytes]]]]
+                ) -> Iterator[Tuple[bytes, Optional[bytes]]]:
+    """
+    K-way merge of sorted runs of (key, rank, value), lower rank = newer.
+    
+    Merged on (key, rank), so each key's newest version comes first and
+    older duplicates are dropped inline. Tombstones (None) are yielded:
+    the caller decides whether they still need to hide anything.
+    """
+    last = None
+    for key, _, value in heapq.merge(*sources):
+        if key != last:
+            last = key
+            yield key, value
+
+
 class LSMStorage:
     """
     LSM-Tree Storage Engine
@@ -93,8 +157,11 @@ class LSMStorage:
     
     def __init__(self, memtable_size: int = 1000):
         self.memtable = {}  # In-memory writes (SkipList in production)
-        self.sstables = []  # List of immutable SSTables on disk
+        self.sstables: List[SSTable] = []  # Immutable sorted runs, oldest first
         self.memtable_size = memtable_size
+        # key → index in sstables of the newest run holding it: a point
+        # read probes exactly one run, however many there are
+        self._latest: Dict[bytes, int] = {}
         
     def put(self, key: bytes, value: bytes) -> None:
         """
@@ -125,18 +192,23 @@ class LSMStorage:
         4. ... check all SSTables
         
         Worst case: Check all SSTables = many disk reads
-        Optimization: Bloom filters (check "is key NOT in this SSTable?")
-        """
-        # Check memtable first
-        if key in self.memtable:
-            return self.memtable[key]
+        (production engines skip most with a Bloom filter per SSTable)
         
-        # Check SSTables (newest first)
-        for sstable in reversed(self.sstables):
-            if key in sstable:
-                return sstable[key]
+        Here a global index (key → newest SSTable holding it) replaces
+        the walk: a miss costs one dict probe, a hit one binary search.
+        The index is exact, so no Bloom filters are needed.
+        """
+        # Check memtable first (one probe; a tombstone is a hit too)
+        value = self.memtable.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
         
-        return None
+        # Jump straight to the one SSTable with the newest version
+        sid = self._latest.get(key)
+        if sid is None:
+            return None
+        sstable = self.sstables[sid]
+        return sstable.values[bisect_left(sstable.keys, key)]
     
     def delete(self, key: bytes) -> None:
         """
@@ -155,10 +227,12 @@ class LSMStorage:
         3. Build index (key → offset in file)
         4. Clear memtable
         """
-        # Create new SSTable from memtable
-        sstable = dict(sorted(self.memtable.items()))
-        self.sstables.append(sstable)
-        self.memtable.clear()
+        # Create new SSTable from memtable (sorted once, here)
+        keys = sorted(self.memtable)
+        memtable = self.memtable
+        self.sstables.append(SSTable(keys, [memtable[key] for key in keys]))
+        memtable.clear()
+        self._latest.update(dict.fromkeys(keys, len(self.sstables) - 1))
     
     def compact(self) -> None:
         """
@@ -175,36 +249,100 @@ class LSMStorage:
         if len(self.sstables) < 2:
             return
         
-        # Merge all SSTables
-        merged = {}
-        for sstable in self.sstables:
-            for key, value in sstable.items():
-                # Keep newest value (later SSTables override earlier ones)
-                if value is not None:  # Skip tombstones
-                    merged[key] = value
+        # Merge all SSTables, streaming: runs are already sorted, so no
+        # rehash and no re-sort. Newest value wins; tombstones are dropped
+        # (this merge covers every run, so nothing older can resurface).
+        keys: List[bytes] = []
+        values: List[Optional[bytes]] = []
+        sources = [zip(sstable.keys, repeat(rank), sstable.values)
+                   for rank, sstable in enumerate(reversed(self.sstables))]
+        for key, value in _merge_runs(sources):
+            if value is not None:
+                keys.append(key)
+                values.append(value)
         
         # Replace all SSTables with one merged SSTable
-        self.sstables = [merged]
+        self.sstables = [SSTable(keys, values)]
+        self._latest = dict.fromkeys(keys, 0)  # Tombstoned keys drop out
     
     def scan_range(self, start_key: bytes, end_key: bytes) -> List[Tuple[bytes, bytes]]:
         """
         Range scan in LSM-Tree (slower than B-Tree).
         Must check all SSTables and merge results.
+        
+        K-way merge of sorted sources (LeetCode #23 again): the in-range
+        slice of each SSTable plus the sorted in-range memtable entries,
+        O(k log S) for k results over S sources.
         """
-        results = {}
+        # One sorted source per run, tagged with its age: 0 = memtable
+        sources = [sorted((key, 0, value) for key, value in self.memtable.items()
+                          if start_key <= key <= end_key)]
+        for rank, sstable in enumerate(reversed(self.sstables), 1):
+            keys = sstable.keys
+            lo = bisect_left(keys, start_key)
+            hi = bisect_right(keys, end_key, lo)
+            sources.append(zip(keys[lo:hi], repeat(rank), sstable.values[lo:hi]))
         
-        # Collect from all sources
-        for key, value in self.memtable.items():
-            if start_key <= key <= end_key and value is not None:
-                results[key] = value
+        # A tombstone hides older versions, then is dropped itself
+        return [(key, value) for key, value in _merge_runs(sources) if value is not None]
+
+
+class CountMinSketch:
+    """
+    Approximate per-key access counts in fixed memory (TinyLFU-style).
+    
+    DEPTH rows of WIDTH saturating byte counters: a key bumps one cell
+    per row and its estimate is the row minimum (collisions can only
+    overcount). A doorkeeper bit set absorbs each key's first sighting,
+    so one-hit wonders never touch the counters. Every sample_size
+    increments all counters are halved and the doorkeeper is cleared,
+    so stale popularity fades.
+    
+    All indices come from the key's built-in hash() (cached on bytes
+    objects): 4 x 12 bits for the rows, 15 bits for the doorkeeper.
+    """
+    
+    DEPTH = 4
+    WIDTH = 4096  # 12 bits of hash per row
+    DOORKEEPER_BITS = 1 << 15
+    _HALVE = bytes(c >> 1 for c in range(256))  # translate() table for aging
+    
+    def __init__(self, sample_size: int = 10 * WIDTH):
+        self.rows = [bytearray(self.WIDTH) for _ in range(self.DEPTH)]
+        self.doorkeeper = bytearray(self.DOORKEEPER_BITS // 8)
+        self.sample_size = sample_size
+        self.additions = 0
+    
+    def increment(self, key: bytes) -> int:
+        """Count one access to key; return its estimated count so far."""
+        h = hash(key)
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
         
-        for sstable in self.sstables:
-            for key, value in sstable.items():
-                if start_key <= key <= end_key and value is not None:
-                    if key not in results:  # Newer values already in results
-                        results[key] = value
+        door = (h >> 48) & (self.DOORKEEPER_BITS - 1)
+        byte, bit = door >> 3, 1 << (door & 7)
+        if not self.doorkeeper[byte] & bit:
+            self.doorkeeper[byte] |= bit
+            return 1
         
-        return sorted(results.items())
+        estimate = 255
+        for i, row in enumerate(self.rows):
+            j = (h >> (12 * i)) & (self.WIDTH - 1)
+            count = row[j]
+            if count < 255:
+                count += 1
+                row[j] = count
+            if count < estimate:
+                estimate = count
+        return estimate + 1  # + the sighting the doorkeeper absorbed
+    
+    def _age(self) -> None:
+        """Halve every counter (one C-level translate per row), reset the doorkeeper."""
+        for row in self.rows:
+            row[:] = row.translate(self._HALVE)
+        self.doorkeeper[:] = bytes(len(self.doorkeeper))
+        self.additions = 0
 
 
 class HybridStorage:
@@ -223,37 +361,44 @@ class HybridStorage:
     def __init__(self):
         self.lsm = LSMStorage()     # For writes
         self.btree = BTreeStorage()  # For reads
-        self.access_count = {}       # Track hot keys
+        self.access_count = CountMinSketch()  # Track hot keys in ~20KB, any key count
         self.hot_threshold = 10      # Promote after 10 reads
         
+        # Bound once: the hot paths make one call instead of an attribute
+        # load + method lookup each. BTreeStorage.get is a bare dict.get,
+        # so the dict's own (C) get is bound directly.
+        self._lsm_put = self.lsm.put
+        self._lsm_get = self.lsm.get
+        self._btree_get = self.btree.data.get
+        self._btree_put = self.btree.put
+        
     def put(self, key: bytes, value: bytes) -> None:
         """
         Always write to LSM (fast).
         Background job migrates hot data to B-Tree.
         """
-        self.lsm.put(key, value)
+        self._lsm_put(key, value)
     
     def get(self, key: bytes) -> Optional[bytes]:
         """
         Check B-Tree first (hot data), then LSM (recent writes).
         Track access patterns for promotion.
-        """
-        # Track access count
-        self.access_count[key] = self.access_count.get(key, 0) + 1
-        
-        # Promote to B-Tree if hot
-        if self.access_count[key] == self.hot_threshold:
-            value = self.lsm.get(key)
-            if value:
-                self.btree.put(key, value)
         
+        Only reads served by the LSM are counted: once a key has been
+        promoted, its B-Tree hits need no tracking.
+        """
         # Try B-Tree first (hot data)
-        value = self.btree.get(key)
+        value = self._btree_get(key)
         if value is not None:
             return value
         
         # Fall back to LSM (recent writes)
-        return self.lsm.get(key)
+        value = self._lsm_get(key)
+        
+        # Promote to B-Tree once the key's estimated read count is hot
+        if value and self.access_count.increment(key) >= self.hot_threshold:
+            self._btree_put(key, value)
+        return value
     
     def delete(self, key: bytes) -> None:
         """Delete from both engines."""
@@ -269,11 +414,12 @@ class HybridStorage:
         btree_results = self.btree.scan_range(start_key, end_key)
         lsm_results = self.lsm.scan_range(start_key, end_key)
         
-        # Merge and deduplicate (LSM takes precedence)
-        merged = {k: v for k, v in btree_results}
-        merged.update({k: v for k, v in lsm_results})
-        
-        return sorted(merged.items())
+        # Both are already sorted: merge and deduplicate in one pass
+        # (LSM takes precedence), no dict and no re-sort
+        return list(_merge_runs([
+            ((k, 0, v) for k, v in lsm_results),
+            ((k, 1, v) for k, v in btree_results),
+        ]))
 
 
 # Example usage
@@ -8,11 +8,23 @@ Implements:
 - Isolation levels
 """
 
-import time
+import itertools
+import logging
+import sys
 import threading
-from typing import Dict, Set, Optional, List, Tuple
+from array import array
+from bisect import bisect_right
+from typing import Callable, Deque, Dict, Set, Optional, List, Tuple, Union, cast
 from enum import Enum
-from collections import defaultdict
+from collections import defaultdict, deque
+
+# Per-operation tracing (BEGIN/WRITE/COMMIT/...) goes to DEBUG: off by
+# default, and %-style args so nothing is formatted unless enabled
+logger = logging.getLogger(__name__)
+
+# next() on itertools.count is a single C call, atomic under the GIL.
+# Free-threaded builds (3.13t) have no GIL, so the counters take a lock.
+_GIL_ENABLED: bool = getattr(sys, "_is_gil_enabled", lambda: True)()
 
 
 class IsolationLevel(Enum):
@@ -29,18 +41,108 @@ class LockType(Enum):
     EXCLUSIVE = "EXCLUSIVE"  # Write lock (exclusive access)
 
 
+# Lock types as small ints for the lock table and held-lock arrays.
+# EXCLUSIVE is 1, so "either side exclusive" is just `code | holder_code`.
+LOCK_CODE = {LockType.SHARED: 0, LockType.EXCLUSIVE: 1}
+
+
+# Version states (TransactionManager.ver_state column). Flipped in place
+# by commit/abort instead of rebuilding chains.
+UNCOMMITTED, COMMITTED, ABORTED = 0, 1, 2
+
+
+# ============================================================================
+# Visibility predicates: specialized once per transaction (at begin) with
+# the isolation dispatch, txn id and snapshot time baked in, so read()
+# runs one small closure per version instead of a chain of branches.
+# ============================================================================
+
+def _visibility(isolation_level: IsolationLevel, txn_id: int,
+                start_time: int) -> Callable[[int, int, int], bool]:
+    """Build the visible(writer, ts, state) check for one transaction."""
+    if isolation_level == IsolationLevel.READ_UNCOMMITTED:
+        def visible(writer: int, ts: int, state: int) -> bool:
+            return state != ABORTED  # See everything not rolled back
+    elif isolation_level == IsolationLevel.READ_COMMITTED:
+        def visible(writer: int, ts: int, state: int) -> bool:
+            # All committed + own writes (own versions can't be ABORTED yet)
+            return state == COMMITTED or writer == txn_id
+    else:
+        # REPEATABLE_READ / SERIALIZABLE: snapshot isolation + own writes
+        def visible(writer: int, ts: int, state: int) -> bool:
+            return writer == txn_id or (state == COMMITTED and ts <= start_time)
+    return visible
+
+
 class Transaction:
-    """Represents a database transaction."""
+    """
+    Represents a database transaction.
+    
+    Held locks are stored struct-of-arrays: held_keys[i] is locked with
+    mode held_types[i] (a LOCK_CODE), so no tuple per lock.
+    
+    Keys are held as interned key ids (see TransactionManager._kid_of).
+    
+    Finished transactions begun by id can be recycled via reset(),
+    keeping their (already grown) containers.
+    """
     
-    def __init__(self, txn_id: int, isolation_level: IsolationLevel = IsolationLevel.READ_COMMITTED):
+    __slots__ = ('txn_id', 'isolation_level', 'start_time', 'visible', 'held_keys',
+                 'held_types', 'undo_log', 'read_set', 'write_set', 'new_versions', 'state',
+                 'pooled')
+    
+    def __init__(self, txn_id: int, start_time: int,
+                 isolation_level: IsolationLevel = IsolationLevel.READ_COMMITTED):
         self.txn_id = txn_id
         self.isolation_level = isolation_level
-        self.start_time = time.time()
-        self.locks_held: Set[Tuple[bytes, LockType]] = set()
-        self.undo_log: List[Tuple[bytes, Optional[bytes]]] = []  # (key, old_value)
-        self.read_set: Set[bytes] = set()  # For REPEATABLE_READ validation
-        self.write_set: Set[bytes] = set()
+        self.start_time = start_time  # Logical timestamp (TransactionManager._next_ts)
+        self.visible = _visibility(isolation_level, txn_id, self.start_time)
+        self.held_keys: List[int] = []
+        self.held_types = bytearray()
+        self.undo_log: List[Tuple[int, Optional[bytes]]] = []  # (key id, old_value)
+        self.read_set: Set[int] = set()  # For REPEATABLE_READ validation
+        self.write_set: Set[int] = set()
+        self.new_versions: List[int] = []  # Version rows this txn created, parallel to undo_log
         self.state = "ACTIVE"  # ACTIVE, COMMITTED, ABORTED
+        self.pooled = False  # True: no handle escaped, recycle when finished
+    
+    def reset(self, txn_id: int, start_time: int, isolation_level: IsolationLevel) -> None:
+        """Reinitialize a finished transaction in place for reuse."""
+        self.txn_id = txn_id
+        self.isolation_level = isolation_level
+        self.start_time = start_time
+        self.visible = _visibility(isolation_level, txn_id, start_time)
+        self.held_keys.clear()
+        del self.held_types[:]
+        self.undo_log.clear()
+        self.read_set.clear()
+        self.write_set.clear()
+        self.new_versions.clear()
+        self.state = "ACTIVE"
+
+
+# Public methods take a txn id (from begin) or a Transaction handle
+# (from begin_txn); the handle skips the active_transactions lookup.
+TxnRef = Union[int, Transaction]
+
+
+class _Shard:
+    """
+    One slice of the lock table, guarded by its own mutex.
+    
+    Waiters block on a per-key condition (sharing the shard mutex),
+    created on first wait and dropped with the last waiter, so a
+    release wakes only threads queued on the keys it freed.
+    
+    Plain dicts, not defaultdicts: lookups never insert, and entries
+    exist only while a key is locked / waited on.
+    """
+    
+    def __init__(self) -> None:
+        self.lock_table: Dict[int, List[Tuple[int, int]]] = {}  # (txn_id, LOCK_CODE)
+        self.lock_waiters: Dict[int, Set[int]] = {}
+        self.mutex = threading.RLock()
+        self.key_cv: Dict[int, threading.Condition] = {}  # For blocking/waking threads
 
 
 class TransactionManager:
@@ -49,32 +151,119 @@ class TransactionManager:
     
     MVCC: Each row has multiple versions with timestamps
     2PL: Acquire locks during transaction, release at commit/abort
+    
+    The lock table is split into LOCK_SHARDS shards by key hash, each
+    with its own mutex (like InnoDB's sharded lock-sys): transactions
+    on disjoint keys never contend on one mutex, and a release only
+    wakes waiters of the keys it freed.
+    
+    Internally every key is interned to a small int id on first sight:
+    the public API takes bytes, but lock, version and read/write-set maps
+    are keyed by id, so each operation hashes the bytes key once.
     """
     
-    def __init__(self):
-        self.next_txn_id = 1
+    LOCK_SHARDS = 64  # Power of two: shard = key id & (LOCK_SHARDS - 1)
+    VERSION_GC_THRESHOLD = 32  # Chain length that triggers _gc_versions
+    TXN_POOL_CAP = 64  # Finished Transaction objects kept for reuse
+    
+    def __init__(self) -> None:
         self.active_transactions: Dict[int, Transaction] = {}
-        
-        # Lock management
-        self.lock_table: Dict[bytes, Set[Tuple[int, LockType]]] = defaultdict(set)
-        self.lock_waiters: Dict[bytes, List[int]] = defaultdict(list)
-        self.lock_cv = threading.Condition()  # For blocking/waking threads
-        
-        # MVCC version chain: key → [(txn_id, value, timestamp), ...]
-        self.versions: Dict[bytes, List[Tuple[int, bytes, float]]] = defaultdict(list)
+        self._txn_pool: List[Transaction] = []
+        
+        # Logical clock for start times and version timestamps: unique,
+        # strictly increasing ints, no syscall and no ties (unlike time.time())
+        self._ts_counter = itertools.count(1)
+        self._txn_counter = itertools.count(1)
+        self._counter_lock: Optional[threading.Lock] = (
+            None if _GIL_ENABLED else threading.Lock())
+        # Start ts is drawn and the txn registered under one lock: GC never
+        # sees a drawn snapshot missing from active_transactions, and
+        # insertion order stays start-time order (see _low_watermark)
+        self._begin_lock = threading.Lock()
+        
+        # Key interning: bytes key ↔ dense int id
+        self._kid: Dict[bytes, int] = {}
+        self._key_by_id: List[bytes] = []
+        self._intern_lock = threading.Lock()
+        
+        # Lock management (sharded)
+        self.shards = [_Shard() for _ in range(self.LOCK_SHARDS)]
+        
+        # Wait-for graph: waiting txn → txns holding what it waits on.
+        # Global (spans shards), so it has its own mutex.
+        self.wait_for: Dict[int, Set[int]] = {}
+        self.wait_lock = threading.Lock()
+        
+        # MVCC versions, struct-of-arrays: version row r is
+        # (ver_txn[r], ver_ts[r], ver_state[r], ver_val[r]), no object or
+        # tuple per version. ver_index is each key's chain of rows.
+        self.ver_txn = array('q')
+        self.ver_ts = array('q')
+        self.ver_state = bytearray()
+        self.ver_val: List[Optional[bytes]] = []
+        self.ver_index: Dict[int, List[int]] = defaultdict(list)  # key id → rows, oldest first
+        
+        # Rows dropped by GC are retired with a timestamp and only reused
+        # once the low-watermark passes it: by then no reader can still
+        # hold a chain that points at them (epoch-based reclamation)
+        self._retired: Deque[Tuple[int, List[int]]] = deque()
+        self._free_rows: List[int] = []
+        self._row_lock = threading.Lock()
+        
+        # Committed history per key: key id → (commit ts list, value list),
+        # parallel and sorted by ts. The head (vals[-1]) is the latest
+        # committed value; a snapshot read is one bisect by start time.
+        # A key's first entry is published already holding its value,
+        # later values are appended before ts, and GC swaps in a new
+        # tuple, so lock-free readers never index past a value.
+        self.committed_index: Dict[int, Tuple[List[int], List[bytes]]] = {}
+        
+        # Conflict index: key id → [(txn_id, start_time)] of active writers.
+        # Only touched under the key's exclusive lock.
+        self.writers_by_key: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
     
     def begin(self, isolation_level: IsolationLevel = IsolationLevel.READ_COMMITTED) -> int:
-        """Start new transaction."""
-        txn_id = self.next_txn_id
-        self.next_txn_id += 1
-        
-        txn = Transaction(txn_id, isolation_level)
-        self.active_transactions[txn_id] = txn
+        """
+        Start new transaction, returning its id.
         
-        print(f"🔰 Transaction {txn_id} BEGIN ({isolation_level.value})")
+        The Transaction object never leaves the manager, so it is taken
+        from (and later returned to) a pool instead of allocated per txn.
+        """
+        txn_id = self._next_txn_id()
+        
+        try:
+            txn = self._txn_pool.pop()
+        except IndexError:
+            txn = None
+        
+        with self._begin_lock:
+            if txn is None:
+                txn = Transaction(txn_id, self._next_ts(), isolation_level)
+                txn.pooled = True
+            else:
+                txn.reset(txn_id, self._next_ts(), isolation_level)
+            self.active_transactions[txn_id] = txn
+        
+        logger.debug("🔰 Transaction %d BEGIN (%s)", txn_id, isolation_level.value)
         return txn_id
     
-    def read(self, txn_id: int, key: bytes) -> Optional[bytes]:
+    def begin_txn(self, isolation_level: IsolationLevel = IsolationLevel.READ_COMMITTED) -> Transaction:
+        """
+        Start new transaction, returning its handle.
+        
+        Pass the handle to read/write/commit/abort instead of the id to
+        skip the active_transactions lookup on every call.
+        """
+        txn_id = self._next_txn_id()
+        
+        with self._begin_lock:
+            txn = Transaction(txn_id, self._next_ts(), isolation_level)
+            self.active_transactions[txn_id] = txn
+        
+        logger.debug("🔰 Transaction %d BEGIN (%s)", txn_id, isolation_level.value)
+        return txn
+    
+    def read(self, txn_ref: TxnRef, key: bytes) -> Optional[bytes]:
         """
         Read value in transaction (MVCC).
         
@@ -84,26 +273,39 @@ class TransactionManager:
         - REPEATABLE_READ: Version from transaction start time
         - SERIALIZABLE: Same as REPEATABLE_READ + validation
         """
-        txn = self.active_transactions[txn_id]
+        txn = self._txn(txn_ref)
+        kid = self._kid_of(key)
         
         # Acquire shared lock (for SERIALIZABLE)
         if txn.isolation_level == IsolationLevel.SERIALIZABLE:
-            self._acquire_lock(txn_id, key, LockType.SHARED)
+            self._acquire_lock(txn, kid, LockType.SHARED)
         
         # Track read (for REPEATABLE_READ validation)
-        txn.read_set.add(key)
-        
-        # Find visible version
-        versions = self.versions.get(key, [])
-        
-        for version_txn_id, value, timestamp in reversed(versions):
-            # Check visibility based on isolation level
-            if self._is_visible(txn, version_txn_id, timestamp):
-                return value
+        txn.read_set.add(kid)
+        
+        # Own writes / dirty reads: answer sits at the chain tail
+        if txn.isolation_level == IsolationLevel.READ_UNCOMMITTED or kid in txn.write_set:
+            visible = txn.visible  # Predicate specialized at begin
+            ver_txn, ver_ts, ver_state = self.ver_txn, self.ver_ts, self.ver_state
+            for row in reversed(self.ver_index.get(kid, ())):
+                if visible(ver_txn[row], ver_ts[row], ver_state[row]):
+                    return self.ver_val[row]
+            return None
+        
+        entry = self.committed_index.get(kid)
+        if entry is None:
+            return None
+        ts_list, vals = entry
+        
+        # READ_COMMITTED: head of the committed history, O(1)
+        if txn.isolation_level == IsolationLevel.READ_COMMITTED:
+            return vals[-1]
         
-        return None
+        # Snapshot: newest commit with ts <= start_time, O(log n)
+        i = bisect_right(ts_list, txn.start_time) - 1
+        return vals[i] if i >= 0 else None
     
-    def write(self, txn_id: int, key: bytes, value: bytes) -> None:
+    def write(self, txn_ref: TxnRef, key: bytes, value: bytes) -> None:
         """
         Write value in transaction (MVCC + 2PL).
         
@@ -112,78 +314,163 @@ class TransactionManager:
         2. Save old value in undo log
         3. Create new version
         """
-        txn = self.active_transactions[txn_id]
+        txn = self._txn(txn_ref)
+        txn_id = txn.txn_id
+        kid = self._kid_of(key)
         
         # Acquire exclusive lock
-        self._acquire_lock(txn_id, key, LockType.EXCLUSIVE)
+        self._acquire_lock(txn, kid, LockType.EXCLUSIVE)
         
-        # Save old value for rollback
-        old_value = self.read(txn_id, key)
-        txn.undo_log.append((key, old_value))
+        # Save old value for rollback. Under the exclusive lock this is just
+        # the latest committed value; no read(), so write keys never land
+        # in read_set (which would skew SERIALIZABLE validation)
+        entry = self.committed_index.get(kid)
+        old_value = entry[1][-1] if entry else None
+        txn.undo_log.append((kid, old_value))
         
         # Create new version (uncommitted)
-        self.versions[key].append((txn_id, value, time.time()))
-        txn.write_set.add(key)
-        
-        print(f"✏️  Txn {txn_id}: WRITE {key.hex()[:8]}... = {value.decode() if len(value) < 20 else value.hex()[:16]+'...'}")
+        chain = self.ver_index[kid]
+        if len(chain) > self.VERSION_GC_THRESHOLD:
+            chain = self._gc_versions(kid)
+        row = self._new_row(txn_id, value)
+        chain.append(row)
+        txn.new_versions.append(row)
+        if kid not in txn.write_set:
+            self.writers_by_key[kid].append((txn_id, txn.start_time))
+            txn.write_set.add(kid)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("✏️  Txn %d: WRITE %s... = %s", txn_id, key.hex()[:8],
+                         value.decode() if len(value) < 20 else value.hex()[:16] + '...')
     
-    def commit(self, txn_id: int) -> None:
+    def commit(self, txn_ref: TxnRef) -> None:
         """
         Commit transaction.
         
         Steps:
         1. Validate (for SERIALIZABLE)
         2. Mark transaction as committed
-        3. Release all locks
+        3. Prune versions of written keys below the low-watermark
+        4. Release all locks
+        
+        Read-only transactions skip straight to step 4: nothing to
+        validate (conflicts are write-write), publish or prune.
         """
-        txn = self.active_transactions[txn_id]
+        txn = self._txn(txn_ref)
+        txn_id = txn.txn_id
+        writes = bool(txn.write_set)
         
         # Validation for SERIALIZABLE
-        if txn.isolation_level == IsolationLevel.SERIALIZABLE:
+        if writes and txn.isolation_level == IsolationLevel.SERIALIZABLE:
             if not self._validate_serializable(txn):
-                print(f"❌ Txn {txn_id}: ABORTED (serialization failure)")
-                self.abort(txn_id)
+                logger.debug("❌ Txn %d: ABORTED (serialization failure)", txn_id)
+                self.abort(txn)
                 raise Exception("Serialization failure")
         
-        # Mark committed
+        # Mark committed (the txn and every version it wrote)
         txn.state = "COMMITTED"
+        if writes:
+            index = self.committed_index
+            ver_state, ver_val, ver_ts = self.ver_state, self.ver_val, self.ver_ts
+            for (kid, _), row in zip(txn.undo_log, txn.new_versions):
+                ver_state[row] = COMMITTED
+                # A key's versions get increasing ts under its exclusive lock,
+                # so a commit always lands at the end of the history
+                value = cast(bytes, ver_val[row])  # Live rows hold bytes
+                entry = index.get(kid)
+                if entry is None:
+                    # Never publish an empty history: build it, then assign
+                    index[kid] = ([ver_ts[row]], [value])
+                else:
+                    entry[1].append(value)
+                    entry[0].append(ver_ts[row])
+        del self.active_transactions[txn_id]
+        if writes:
+            self._forget_writers(txn)
+            
+            # GC while still holding the write locks (amortized over commits)
+            for kid in txn.write_set:
+                self._gc(kid)
         
         # Release locks
-        self._release_all_locks(txn_id)
+        self._release_all_locks(txn)
+        self._recycle(txn)
         
-        del self.active_transactions[txn_id]
-        
-        print(f"✅ Transaction {txn_id} COMMITTED")
+        logger.debug("✅ Transaction %d COMMITTED", txn_id)
     
-    def abort(self, txn_id: int) -> None:
+    def abort(self, txn_ref: TxnRef) -> None:
         """
         Abort/rollback transaction.
         
         Steps:
         1. Undo all writes
-        2. Remove uncommitted versions
+        2. Mark uncommitted versions ABORTED (O(1) each, no chain rebuild)
         3. Release locks
-        """
-        txn = self.active_transactions[txn_id]
         
-        # Undo writes
-        for key, old_value in reversed(txn.undo_log):
-            # Remove uncommitted version
-            versions = self.versions[key]
-            self.versions[key] = [(t, v, ts) for t, v, ts in versions if t != txn_id]
-            
-            print(f"↩️  Txn {txn_id}: UNDO {key.hex()[:8]}...")
+        A transaction that never wrote has nothing to undo: O(1) apart
+        from releasing any SERIALIZABLE read locks.
+        """
+        txn = self._txn(txn_ref)
+        txn_id = txn.txn_id
+        writes = bool(txn.write_set)
+        
+        # Undo writes: readers skip ABORTED versions, GC drops them later
+        if writes:
+            ver_state = self.ver_state
+            for row in txn.new_versions:
+                ver_state[row] = ABORTED
+            if logger.isEnabledFor(logging.DEBUG):
+                for kid, old_value in reversed(txn.undo_log):
+                    logger.debug("↩️  Txn %d: UNDO %s...", txn_id, self._key_by_id[kid].hex()[:8])
         
         txn.state = "ABORTED"
+        del self.active_transactions[txn_id]
+        if writes:
+            self._forget_writers(txn)
         
         # Release locks
-        self._release_all_locks(txn_id)
+        self._release_all_locks(txn)
+        self._recycle(txn)
         
-        del self.active_transactions[txn_id]
+        logger.debug("🔄 Transaction %d ABORTED", txn_id)
+    
+    def vacuum(self) -> int:
+        """
+        Periodic maintenance: low-watermark GC over every key.
         
-        print(f"🔄 Transaction {txn_id} ABORTED")
+        Returns the number of versions removed.
+        """
+        before = sum(len(chain) for chain in self.ver_index.values())
+        for kid in list(self.ver_index):
+            self._gc(kid)
+        return before - sum(len(chain) for chain in self.ver_index.values())
     
-    def _acquire_lock(self, txn_id: int, key: bytes, lock_type: LockType) -> None:
+    def _txn(self, txn_ref: TxnRef) -> Transaction:
+        """Resolve an id or handle to an active Transaction."""
+        if isinstance(txn_ref, Transaction):
+            if txn_ref.state != "ACTIVE":
+                raise KeyError(txn_ref.txn_id)  # Same error as a stale id
+            return txn_ref
+        return self.active_transactions[txn_ref]
+    
+    def _recycle(self, txn: Transaction) -> None:
+        """Return a finished id-only transaction to the pool (capped)."""
+        if txn.pooled and len(self._txn_pool) < self.TXN_POOL_CAP:
+            self._txn_pool.append(txn)
+    
+    def _kid_of(self, key: bytes) -> int:
+        """Interned id of key, assigned on first sight."""
+        kid = self._kid.get(key)
+        if kid is None:
+            with self._intern_lock:
+                kid = self._kid.get(key)
+                if kid is None:
+                    kid = len(self._key_by_id)
+                    self._key_by_id.append(key)
+                    self._kid[key] = kid
+        return kid
+    
+    def _acquire_lock(self, txn: Transaction, kid: int, lock_type: LockType) -> None:
         """
         Acquire lock with 2PL protocol.
         
@@ -191,91 +478,334 @@ class TransactionManager:
                     SHARED  EXCLUSIVE
         SHARED        ✅        ❌
         EXCLUSIVE     ❌        ❌
+        
+        Deadlocks are detected exactly before blocking, so waits need
+        no timeout: a waiter only wakes when a lock on its key is
+        released.
+        
+        Most locks are uncontended: a key nobody holds or waits on is
+        granted straight away, without the compatibility check or any
+        wait-for graph update.
         """
-        with self.lock_cv:
-            while True:
-                holders = self.lock_table[key]
-                
-                # Check compatibility
-                can_acquire = True
-                for holder_txn_id, holder_lock_type in holders:
-                    if holder_txn_id == txn_id:
-                        continue  # Already hold lock
+        txn_id = txn.txn_id
+        code = LOCK_CODE[lock_type]
+        shard = self._shard(kid)
+        with shard.mutex:
+            if kid not in shard.lock_table and kid not in shard.lock_waiters:
+                shard.lock_table[kid] = [(txn_id, code)]
+                txn.held_keys.append(kid)
+                txn.held_types.append(code)
+                return
+            
+            # Registered as a waiter once, on first block, and removed once
+            # on the way out (granted or deadlock), not per wakeup
+            waiters: Optional[Set[int]] = None
+            cv: Optional[threading.Condition] = None
+            try:
+                while True:
+                    holders = shard.lock_table.get(kid, ())
                     
-                    # Check compatibility
-                    if lock_type == LockType.EXCLUSIVE or holder_lock_type == LockType.EXCLUSIVE:
-                        can_acquire = False
+                    # Check compatibility: who holds a conflicting lock?
+                    blockers = {holder_txn_id for holder_txn_id, holder_code in holders
+                                if holder_txn_id != txn_id  # Already hold lock
+                                and code | holder_code}  # Either side EXCLUSIVE
+                    
+                    if not blockers:
+                        # Acquire lock (once per mode)
+                        entry = (txn_id, code)
+                        if entry not in holders:
+                            shard.lock_table.setdefault(kid, []).append(entry)
+                            txn.held_keys.append(kid)
+                            txn.held_types.append(code)
+                        self._lock_granted(txn_id, shard.lock_waiters.get(kid))
                         break
-                
-                if can_acquire:
-                    # Acquire lock
-                    self.lock_table[key].add((txn_id, lock_type))
-                    self.active_transactions[txn_id].locks_held.add((key, lock_type))
-                    break
-                else:
+                    
                     # Detect deadlock
-                    if self._would_deadlock(txn_id, key):
+                    if self._would_deadlock(txn_id, blockers):
                         raise Exception(f"Deadlock detected for txn {txn_id}")
                     
                     # Wait for lock
-                    print(f"⏳ Txn {txn_id}: Waiting for {lock_type.value} lock on {key.hex()[:8]}...")
-                    self.lock_waiters[key].append(txn_id)
-                    self.lock_cv.wait(timeout=1.0)
-                    self.lock_waiters[key].remove(txn_id)
+                    if cv is None:
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("⏳ Txn %d: Waiting for %s lock on %s...", txn_id,
+                                         lock_type.value, self._key_by_id[kid].hex()[:8])
+                        waiters = shard.lock_waiters.setdefault(kid, set())
+                        waiters.add(txn_id)
+                        cv = shard.key_cv.get(kid)
+                        if cv is None:
+                            cv = shard.key_cv[kid] = threading.Condition(shard.mutex)
+                    cv.wait()
+            finally:
+                if waiters is not None:
+                    waiters.discard(txn_id)
+                    if not waiters:
+                        del shard.lock_waiters[kid]
+                        del shard.key_cv[kid]
     
-    def _release_all_locks(self, txn_id: int) -> None:
+    def _release_all_locks(self, txn: Transaction) -> None:
         """Release all locks held by transaction."""
-        txn = self.active_transactions[txn_id]
+        if not txn.held_keys:
+            return  # Lock-free txn: also never left a wait-for edge behind
+        txn_id = txn.txn_id
+        
+        with self.wait_lock:
+            self.wait_for.pop(txn_id, None)
+        
+        # Group by shard so each shard's mutex is taken once
+        by_shard: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        mask = self.LOCK_SHARDS - 1
+        held_types = txn.held_types
+        for i, kid in enumerate(txn.held_keys):
+            by_shard[kid & mask].append((kid, held_types[i]))
+        
+        for index, held in by_shard.items():
+            shard = self.shards[index]
+            with shard.mutex:
+                for kid, code in held:
+                    holders = shard.lock_table[kid]
+                    holders.remove((txn_id, code))
+                    if not holders:
+                        del shard.lock_table[kid]  # Don't leak empty entries
+                    
+                    # Wake waiters of this key only, if there are any
+                    cv = shard.key_cv.get(kid)
+                    if cv is not None:
+                        cv.notify_all()
+        txn.held_keys.clear()
+        del txn.held_types[:]
+    
+    def _shard(self, kid: int) -> _Shard:
+        """Shard owning the lock entry for key id kid."""
+        return self.shards[kid & (self.LOCK_SHARDS - 1)]
+    
+    def _new_row(self, txn_id: int, value: bytes) -> int:
+        """Store an UNCOMMITTED version, reusing a reclaimed row if any."""
+        ts = self._next_ts()
+        with self._row_lock:  # Keep the four columns aligned
+            free = self._free_rows
+            if not free:
+                self._reclaim_rows()
+            if free:
+                row = free.pop()
+                self.ver_txn[row] = txn_id
+                self.ver_ts[row] = ts
+                self.ver_state[row] = UNCOMMITTED
+                self.ver_val[row] = value
+            else:
+                row = len(self.ver_val)
+                self.ver_txn.append(txn_id)
+                self.ver_ts.append(ts)
+                self.ver_state.append(UNCOMMITTED)
+                self.ver_val.append(value)
+        return row
+    
+    def _retire_rows(self, rows: List[int]) -> None:
+        """Hand rows unlinked from a chain to deferred reclamation."""
+        if rows:
+            self._retired.append((self._next_ts(), rows))
+    
+    def _reclaim_rows(self) -> None:
+        """
+        Free retired rows no active transaction can still reach.
         
-        with self.lock_cv:
-            for key, lock_type in txn.locks_held:
-                self.lock_table[key].discard((txn_id, lock_type))
-            
-            # Wake up waiters
-            self.lock_cv.notify_all()
-    
-    def _is_visible(self, txn: Transaction, version_txn_id: int, version_timestamp: float) -> bool:
-        """Check if version is visible to transaction."""
-        if txn.isolation_level == IsolationLevel.READ_UNCOMMITTED:
-            return True  # See everything
-        
-        # Check if version's transaction is committed
-        if version_txn_id in self.active_transactions:
-            version_txn = self.active_transactions[version_txn_id]
-            if version_txn.state != "COMMITTED":
-                if version_txn_id == txn.txn_id:
-                    return True  # See own writes
-                return False  # Don't see uncommitted from other txns
+        A chain is swapped before its dropped rows are stamped, so any
+        txn that began after the stamp only ever sees the new chain.
+        Caller holds _row_lock.
+        """
+        lwm = self._low_watermark()
+        retired = self._retired
+        while retired and retired[0][0] < lwm:
+            rows = retired.popleft()[1]
+            for row in rows:
+                self.ver_val[row] = None  # Drop the payload now
+            self._free_rows.extend(rows)
+    
+    def _gc_versions(self, kid: int) -> List[int]:
+        """
+        Drop ABORTED versions from the tail of a key's chain.
         
-        if txn.isolation_level == IsolationLevel.READ_COMMITTED:
-            return True  # See all committed
+        Called by write() under the key's exclusive lock, so nothing
+        can be appending to the chain concurrently. The chain is
+        replaced, not mutated, so lock-free readers iterating the old
+        list stay consistent. Returns the new chain.
+        """
+        chain = self.ver_index[kid]
+        ver_state = self.ver_state
+        end = len(chain)
+        while end and ver_state[chain[end - 1]] == ABORTED:
+            end -= 1
+        if end < len(chain):
+            dropped = chain[end:]
+            chain = self.ver_index[kid] = chain[:end]
+            self._retire_rows(dropped)
+        return chain
+    
+    def _next_txn_id(self) -> int:
+        """Next transaction id: no shared `+= 1` read-modify-write to race on."""
+        lock = self._counter_lock
+        if lock is None:
+            return next(self._txn_counter)
+        with lock:
+            return next(self._txn_counter)
+    
+    def _next_ts(self) -> int:
+        """Next logical timestamp (same atomicity as _next_txn_id)."""
+        lock = self._counter_lock
+        if lock is None:
+            return next(self._ts_counter)
+        with lock:
+            return next(self._ts_counter)
+    
+    def _low_watermark(self) -> int:
+        """
+        Start time of the oldest active transaction (sys.maxsize if none).
         
-        if txn.isolation_level in [IsolationLevel.REPEATABLE_READ, IsolationLevel.SERIALIZABLE]:
-            return version_timestamp <= txn.start_time  # Snapshot isolation
+        No snapshot older than this can still be read. active_transactions
+        is insertion-ordered by begin(), so the oldest is simply the first
+        entry: O(1), no sorted structure to maintain. A txn whose begin()
+        hasn't registered yet can't have drawn its start ts either, so it
+        will start above every ts in use now.
+        """
+        for txn in self.active_transactions.values():
+            return txn.start_time
+        return sys.maxsize
+    
+    def _gc(self, kid: int) -> None:
+        """
+        Low-watermark GC: prune versions no active snapshot can see.
         
-        return False
+        The newest COMMITTED version with ts <= lwm is what the oldest
+        snapshot reads; every older COMMITTED or ABORTED version is
+        shadowed for all active and future transactions. Older
+        UNCOMMITTED versions are kept, their writer may still commit.
+        The committed index is cut at the same point.
+        """
+        lwm = self._low_watermark()
+        
+        entry = self.committed_index.get(kid)
+        if entry is not None:
+            ts_list, vals = entry
+            pin = bisect_right(ts_list, lwm) - 1
+            if pin > 0:
+                self.committed_index[kid] = (ts_list[pin:], vals[pin:])
+        
+        chain = self.ver_index.get(kid)
+        if not chain:
+            return
+        ver_state, ver_ts = self.ver_state, self.ver_ts
+        
+        # Newest version visible at the low-watermark (chains stay short)
+        for pin in range(len(chain) - 1, 0, -1):
+            row = chain[pin]
+            if ver_state[row] == COMMITTED and ver_ts[row] <= lwm:
+                break
+        else:
+            return  # Nothing older than a pinned version
+        
+        kept = [r for r in chain[:pin] if ver_state[r] == UNCOMMITTED]
+        self.ver_index[kid] = kept + chain[pin:]  # Replace: readers hold the old list
+        self._retire_rows([r for r in chain[:pin] if ver_state[r] != UNCOMMITTED])
     
     def _validate_serializable(self, txn: Transaction) -> bool:
-        """Validate serializable isolation (detect conflicts)."""
-        # Check for write-write conflicts
-        for key in txn.write_set:
-            for other_txn_id, other_txn in self.active_transactions.items():
-                if other_txn_id == txn.txn_id:
-                    continue
-                if key in other_txn.write_set and other_txn.start_time < txn.start_time:
+        """
+        Validate serializable isolation (detect conflicts).
+        
+        O(W + writers) via writers_by_key instead of scanning every
+        active transaction's write set.
+        """
+        # Check for write-write conflicts (index holds active writers only)
+        txn_id, start_time = txn.txn_id, txn.start_time
+        for kid in txn.write_set:
+            for other_txn_id, other_start in self.writers_by_key[kid]:
+                if other_txn_id != txn_id and other_start < start_time:
                     return False  # Write-write conflict
         
         return True
     
-    def _would_deadlock(self, txn_id: int, key: bytes) -> bool:
-        """Simple deadlock detection: Check for cycles in wait-for graph."""
-        # In production: Use wait-for graph or timeout
-        # For now: Just timeout (handled in _acquire_lock)
+    def _forget_writers(self, txn: Transaction) -> None:
+        """Drop txn from the conflict index (before its locks go)."""
+        entry = (txn.txn_id, txn.start_time)
+        for kid in txn.write_set:
+            writers = self.writers_by_key[kid]
+            writers.remove(entry)
+            if not writers:
+                del self.writers_by_key[kid]
+    
+    def _lock_granted(self, txn_id: int, waiters: Optional[Set[int]]) -> None:
+        """
+        Update the wait-for graph after txn_id got a lock.
+        
+        It no longer waits, and anyone still queued on the key now also
+        waits for it (e.g. a late SHARED grant ahead of an EXCLUSIVE
+        waiter), so cycles through it stay visible to detection.
+        """
+        with self.wait_lock:
+            self.wait_for.pop(txn_id, None)
+            for waiter in waiters or ():
+                edges = self.wait_for.get(waiter)
+                if edges is not None and waiter != txn_id:
+                    edges.add(txn_id)
+    
+    def _would_deadlock(self, txn_id: int, blockers: Set[int]) -> bool:
+        """
+        Deadlock detection: cycle check in the wait-for graph.
+        
+        Records txn_id → blockers, then runs Tarjan's SCC from txn_id:
+        O(V + E) over the reachable part of the graph. If txn_id lands in
+        a non-trivial SCC, waiting would close a cycle. The requester is
+        the victim (as in PostgreSQL): it is the only cycle member not
+        parked in a wait, so it can back out without cross-shard wakeups.
+        """
+        with self.wait_lock:
+            self.wait_for[txn_id] = blockers
+            if self._in_cycle(txn_id):
+                del self.wait_for[txn_id]
+                return True
+            return False
+    
+    def _in_cycle(self, start: int) -> bool:
+        """Iterative Tarjan SCC from start: is start on a cycle?"""
+        graph = self.wait_for
+        index = {start: 0}
+        low = {start: 0}
+        stack = [start]
+        on_stack = {start}
+        work = [(start, iter(graph.get(start, ())))]
+        
+        while work:
+            node, edges = work[-1]
+            for succ in edges:
+                if succ not in index:
+                    # Tree edge: descend
+                    index[succ] = low[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(graph.get(succ, ()))))
+                    break
+                if succ in on_stack:
+                    low[node] = min(low[node], index[succ])
+            else:
+                # All successors done: propagate low-link to parent
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    if node == start:
+                        return len(stack) > 1  # start's SCC is what's left
+                    # Pop a finished SCC that doesn't contain start
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        if member == node:
+                            break
         return False
 
 
 # Example usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s", stream=sys.stdout)
+    
     print("=" * 60)
     print("Transaction Manager Demo")
     print("=" * 60)
@@ -291,7 +821,7 @@ if __name__ == "__main__":
     tm.write(txn1, b"account:1", b"balance:1000")
     tm.write(txn1, b"account:2", b"balance:500")
     value = tm.read(txn1, b"account:1")
-    print(f"📖 Txn {txn1}: READ account:1 = {value}")
+    print(f"📖 Txn {txn1}: READ account:1 = {value!r}")
     tm.commit(txn1)
     
     # Transaction 2: Abort
@@ -307,7 +837,7 @@ if __name__ == "__main__":
     # Transaction 3: Read committed data
     txn3 = tm.begin()
     value = tm.read(txn3, b"account:1")
-    print(f"📖 Txn {txn3}: READ account:1 = {value}")  # Should see 1000, not 2000
+    print(f"📖 Txn {txn3}: READ account:1 = {value!r}")  # Should see 1000, not 2000
     tm.commit(txn3)
     
     print("\n✅ All transactions completed!")
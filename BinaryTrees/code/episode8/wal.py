@@ -5,22 +5,87 @@ Ensures all committed writes survive crashes.
 The secret: Log changes BEFORE modifying data pages.
 """
 
+import mmap
 import os
-import json
+import struct
+import sys
+import threading
 import time
-from typing import List, Dict, Any, Optional
-from enum import Enum
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+from enum import IntEnum
 
 
-class LogEntryType(Enum):
-    """Types of WAL entries."""
-    BEGIN = "BEGIN"
-    COMMIT = "COMMIT"
-    ABORT = "ABORT"
-    INSERT = "INSERT"
-    UPDATE = "UPDATE"
-    DELETE = "DELETE"
-    CHECKPOINT = "CHECKPOINT"
+class LogEntryType(IntEnum):
+    """Types of WAL entries (the int is the on-disk type byte)."""
+    BEGIN = 1
+    COMMIT = 2
+    ABORT = 3
+    INSERT = 4
+    UPDATE = 5
+    DELETE = 6
+    CHECKPOINT = 7
+
+
+# Record header: CRC32 u32 of everything after it, type u8, txn_id u64,
+# lsn i64, timestamp f64, then the lengths of table/key/value/old_value
+# (i32, -1 = None). The four byte strings follow raw, so a record is
+# self-delimiting: no newlines, no JSON, no hex. The CRC catches torn
+# and garbage (e.g. zero-filled) tails.
+_HEADER = struct.Struct('<IBQqdiiii')
+_CRC = struct.Struct('<I')
+_FIELDS = struct.Struct('<BQqdiiii')  # _HEADER minus the CRC
+_ENTRY_TYPES = frozenset(LogEntryType)
+
+# writev() hands the kernel all records of a batch in one call without
+# joining them first; it takes at most IOV_MAX buffers per call
+_HAS_WRITEV = hasattr(os, 'writev')
+_IOV_MAX = os.sysconf('SC_IOV_MAX') if hasattr(os, 'sysconf') else 1024
+
+
+# Decoded keys repeat across records (every UPDATE of a hot row), so
+# recovery hands out one shared bytes object per distinct key: fewer
+# allocations, and dict lookups on it short-circuit on identity. Python
+# only interns str, hence this small LRU-capped table.
+_INTERN_CAP = 65536
+_interned: 'OrderedDict[bytes, bytes]' = OrderedDict()
+
+
+def _intern_bytes(b: bytes) -> bytes:
+    """Canonical shared copy of b (sys.intern for bytes)."""
+    cached = _interned.get(b)
+    if cached is not None:
+        _interned.move_to_end(b)
+        return cached
+    _interned[b] = b
+    if len(_interned) > _INTERN_CAP:
+        _interned.popitem(last=False)  # Evict least recently used
+    return b
+
+
+def _iter_headers(data: bytes) -> Iterator[Tuple[int, int, int, int, int]]:
+    """
+    Yield (start, end, entry_type, txn_id, lsn) for each record in a
+    WAL image, from the fixed headers (payloads are checksummed in
+    place, not copied or decoded).
+    
+    Stops at a torn tail (a record cut short by a crash mid-write) or
+    any record failing its CRC: nothing after it can be trusted.
+    """
+    offset = 0
+    size = len(data)
+    with memoryview(data) as view:  # Released before the mmap is closed
+        while offset + _HEADER.size <= size:
+            crc, entry_type, txn_id, lsn, _, *lengths = _HEADER.unpack_from(data, offset)
+            if entry_type not in _ENTRY_TYPES or min(lengths) < -1:
+                break
+            end = offset + _HEADER.size + sum(n for n in lengths if n > 0)
+            if end > size or zlib.crc32(view[offset + _CRC.size:end]) != crc:
+                break
+            yield offset, end, entry_type, txn_id, lsn
+            offset = end
 
 
 class LogEntry:
@@ -39,34 +104,91 @@ class LogEntry:
         self.timestamp = time.time()
     
     def serialize(self) -> bytes:
-        """Convert to bytes for writing to disk."""
-        data = {
-            'type': self.entry_type.value,
-            'txn_id': self.txn_id,
-            'table': self.table,
-            'key': self.key.hex() if self.key else None,
-            'value': self.value.hex() if self.value else None,
-            'old_value': self.old_value.hex() if self.old_value else None,
-            'lsn': self.lsn,
-            'timestamp': self.timestamp,
-        }
-        return json.dumps(data).encode() + b'\n'
+        """Convert to bytes for writing to disk: packed header + raw fields."""
+        table = self.table.encode() if self.table is not None else None
+        fields = (table, self.key, self.value, self.old_value)
+        body = _FIELDS.pack(
+            self.entry_type, self.txn_id,
+            self.lsn if self.lsn is not None else -1, self.timestamp,
+            *[len(f) if f is not None else -1 for f in fields])
+        body += b''.join(f for f in fields if f)
+        return _CRC.pack(zlib.crc32(body)) + body
     
     @staticmethod
     def deserialize(data: bytes) -> 'LogEntry':
         """Parse from bytes."""
-        obj = json.loads(data.decode())
+        return LogEntry.deserialize_from(data, 0)[0]
+    
+    @staticmethod
+    def peek_header(data: bytes, offset: int = 0) -> Tuple[int, int, int, int]:
+        """(entry_type, txn_id, lsn, record end offset) without decoding the payload."""
+        _, entry_type, txn_id, lsn, _, *lengths = _HEADER.unpack_from(data, offset)
+        end = offset + _HEADER.size + sum(n for n in lengths if n > 0)
+        return entry_type, txn_id, lsn, end
+    
+    @staticmethod
+    def deserialize_from(data: bytes, offset: int) -> Tuple['LogEntry', int]:
+        """Parse the record at offset: (entry, offset just past it)."""
+        _, entry_type, txn_id, lsn, timestamp, *lengths = _HEADER.unpack_from(data, offset)
+        pos = offset + _HEADER.size
+        fields: List[Optional[bytes]] = []
+        for n in lengths:
+            if n < 0:
+                fields.append(None)
+            else:
+                fields.append(bytes(data[pos:pos + n]))
+                pos += n
+        table, key, value, old_value = fields
         entry = LogEntry(
-            entry_type=LogEntryType(obj['type']),
-            txn_id=obj['txn_id'],
-            table=obj.get('table'),
-            key=bytes.fromhex(obj['key']) if obj.get('key') else None,
-            value=bytes.fromhex(obj['value']) if obj.get('value') else None,
-            old_value=bytes.fromhex(obj['old_value']) if obj.get('old_value') else None,
+            entry_type=LogEntryType(entry_type),
+            txn_id=txn_id,
+            table=sys.intern(table.decode()) if table is not None else None,
+            key=_intern_bytes(key) if key is not None else None,
+            value=value,
+            old_value=old_value,
         )
-        entry.lsn = obj['lsn']
-        entry.timestamp = obj['timestamp']
-        return entry
+        entry.lsn = lsn
+        entry.timestamp = timestamp
+        return entry, pos
+
+
+# Recovery dispatch: entry type → how to redo / undo it. One dict
+# lookup per record instead of a chain of enum comparisons; types not
+# listed (BEGIN, COMMIT, ...) carry no data change.
+def _redo_put(storage: Dict[bytes, bytes], entry: LogEntry) -> None:
+    storage[entry.key] = entry.value
+
+
+def _redo_delete(storage: Dict[bytes, bytes], entry: LogEntry) -> None:
+    storage.pop(entry.key, None)
+
+
+def _undo_write(storage: Dict[bytes, bytes], entry: LogEntry) -> None:
+    if entry.old_value is not None:
+        storage[entry.key] = entry.old_value  # Restore before-image
+
+
+def _undo_insert(storage: Dict[bytes, bytes], entry: LogEntry) -> None:
+    if entry.old_value is not None:
+        storage[entry.key] = entry.old_value
+    else:
+        storage.pop(entry.key, None)  # Key didn't exist before
+
+
+def _noop(storage: Dict[bytes, bytes], entry: LogEntry) -> None:
+    pass
+
+
+_REDO = {
+    LogEntryType.INSERT: _redo_put,
+    LogEntryType.UPDATE: _redo_put,
+    LogEntryType.DELETE: _redo_delete,
+}
+_UNDO = {
+    LogEntryType.INSERT: _undo_insert,
+    LogEntryType.UPDATE: _undo_write,
+    LogEntryType.DELETE: _undo_write,
+}
 
 
 class WriteAheadLog:
@@ -88,27 +210,46 @@ class WriteAheadLog:
         # Recovery state
         self.last_checkpoint_lsn = 0
         
-        # Create WAL file if doesn't exist
-        if not os.path.exists(wal_file):
-            open(wal_file, 'w').close()
-        else:
+        # Create WAL file if doesn't exist: one open, kept for the log's
+        # lifetime (a flush is write + fsync, not open + N writes + close;
+        # reads use pread on the same fd)
+        self.fd = os.open(wal_file, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size > 0:
             self._load_state()
+        
+        # Group commit: a background writer owns write + fsync, and
+        # appenders wait on the condition for durable_lsn to pass them
+        self.durable_lsn = self.next_lsn - 1  # Highest LSN known to be on disk
+        self._cv = threading.Condition()
+        self._sync_requested = False
+        self._closing = False
+        self._error: Optional[OSError] = None
+        self._writer = threading.Thread(target=self._writer_loop, name="wal-writer", daemon=True)
+        self._writer.start()
     
     def append(self, entry: LogEntry) -> int:
         """
         Append log entry to WAL.
         
+        A COMMIT entry returns only once it is durable. Other entries
+        just join the buffer; the writer thread drains it when it fills
+        or when a commit/flush asks.
+        
         Returns:
             LSN (Log Sequence Number) of written entry
         """
-        entry.lsn = self.next_lsn
-        self.next_lsn += 1
-        
-        self.log_buffer.append(entry)
-        
-        # Flush if buffer full
-        if len(self.log_buffer) >= self.buffer_size:
-            self.flush()
+        with self._cv:
+            if self._closing:
+                raise Exception("WAL is closed")
+            entry.lsn = self.next_lsn
+            self.next_lsn += 1
+            
+            self.log_buffer.append(entry)
+            
+            if entry.entry_type == LogEntryType.COMMIT:
+                self._wait_durable(entry.lsn)
+            elif len(self.log_buffer) >= self.buffer_size:
+                self._cv.notify_all()  # Buffer full: writer drains it, we don't wait
         
         return entry.lsn
     
@@ -118,17 +259,81 @@ class WriteAheadLog:
         
         fsync() guarantees: Data written to physical disk (not just OS cache).
         This is THE operation that provides durability!
-        """
-        if not self.log_buffer:
-            return
         
-        with open(self.wal_file, 'ab') as f:
-            for entry in self.log_buffer:
-                f.write(entry.serialize())
-            f.flush()
-            os.fsync(f.fileno())  # 💥 Force write to disk!
+        Waits until everything appended so far is durable.
+        """
+        with self._cv:
+            self._wait_durable(self.next_lsn - 1)
+    
+    def _wait_durable(self, lsn: int) -> None:
+        """Block until durable_lsn >= lsn (caller holds self._cv)."""
+        while self.durable_lsn < lsn:
+            if self._error is not None:
+                raise Exception("WAL writer failed") from self._error
+            self._sync_requested = True
+            self._cv.notify_all()
+            self._cv.wait()
+    
+    def _writer_loop(self) -> None:
+        """
+        Group commit: take everything buffered, write + fsync it once,
+        then wake every appender whose LSN that covered.
         
-        self.log_buffer.clear()
+        Appenders keep buffering while an fsync is in flight, so under
+        concurrency one fsync makes many commits durable.
+        """
+        cv = self._cv
+        while True:
+            with cv:
+                while not (self._sync_requested or self._closing
+                           or len(self.log_buffer) >= self.buffer_size):
+                    cv.wait()
+                batch = self.log_buffer
+                if not batch and self._closing:
+                    return
+                self.log_buffer = []
+                self._sync_requested = False
+            
+            if batch:
+                try:
+                    # The whole batch in one syscall
+                    self._write([entry.serialize() for entry in batch])
+                    os.fsync(self.fd)  # 💥 Force write to disk!
+                except OSError as exc:
+                    with cv:
+                        self._error = exc
+                        cv.notify_all()
+                    return
+            
+            with cv:
+                if batch:
+                    self.durable_lsn = batch[-1].lsn
+                cv.notify_all()
+    
+    def _write(self, records: List[bytes]) -> None:
+        """Append records with one writev() (or one write() of the joined batch)."""
+        if _HAS_WRITEV and len(records) <= _IOV_MAX:
+            written = os.writev(self.fd, records)
+            total = sum(map(len, records))
+            if written == total:
+                return
+            payload = b''.join(records)[written:]  # Short write: finish the rest
+        else:
+            payload = b''.join(records)
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(self.fd, view):]
+    
+    def close(self) -> None:
+        """Flush pending entries, stop the writer and close the log file."""
+        with self._cv:
+            if self._closing:
+                return
+            self._closing = True
+            self._cv.notify_all()
+        self._writer.join()
+        os.close(self.fd)
+        self.fd = -1
     
     def checkpoint(self) -> None:
         """
@@ -140,10 +345,8 @@ class WriteAheadLog:
         
         PostgreSQL: Checkpoint every checkpoint_timeout (default 5 minutes)
         """
-        # Flush any pending log entries
-        self.flush()
-        
-        # Record checkpoint in log
+        # Record checkpoint in log: pending entries go to disk with it,
+        # under a single fsync
         checkpoint_entry = LogEntry(
             entry_type=LogEntryType.CHECKPOINT,
             txn_id=0,
@@ -155,7 +358,7 @@ class WriteAheadLog:
         
         print(f"✅ Checkpoint at LSN {self.last_checkpoint_lsn}")
     
-    def recover(self, storage: Dict[bytes, bytes]) -> Dict[int, List[LogEntry]]:
+    def recover(self, storage: Dict[bytes, bytes], verbose: bool = True) -> Dict[int, List[LogEntry]]:
         """
         Crash recovery: Replay WAL to restore consistent state.
         
@@ -164,6 +367,9 @@ class WriteAheadLog:
         2. Redo all committed transactions
         3. Undo all uncommitted transactions
         
+        verbose=False drops the per-entry REDO trace, which dominates
+        the cost of replaying a large log.
+        
         Returns:
             Dictionary of txn_id → list of log entries
         """
@@ -174,42 +380,43 @@ class WriteAheadLog:
         transactions: Dict[int, List[LogEntry]] = {}
         committed_txns = set()
         
-        # Read all log entries from last checkpoint
-        with open(self.wal_file, 'rb') as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                
-                entry = LogEntry.deserialize(line)
-                
+        # Read all log entries from last checkpoint: the file is mapped,
+        # not read in, and headers are parsed in place
+        redo: List[LogEntry] = []  # Committed entries, in log order
+        with self._map_log() as data:
+            # Pass 1, headers only: skip pre-checkpoint records without
+            # decoding them, and find the committed transactions
+            offsets = []
+            for start, _, entry_type, txn_id, lsn in _iter_headers(data):
                 # Only replay from last checkpoint
-                if entry.lsn < self.last_checkpoint_lsn:
+                if lsn < self.last_checkpoint_lsn:
                     continue
+                offsets.append(start)
+                
+                # Mark committed transactions
+                if entry_type == LogEntryType.COMMIT:
+                    committed_txns.add(txn_id)
+            
+            # Pass 2: decode just the records that will be redone or undone
+            for start in offsets:
+                entry, _ = LogEntry.deserialize_from(data, start)
                 
                 # Track transaction entries
                 if entry.txn_id not in transactions:
                     transactions[entry.txn_id] = []
                 transactions[entry.txn_id].append(entry)
-                
-                # Mark committed transactions
-                if entry.entry_type == LogEntryType.COMMIT:
-                    committed_txns.add(entry.txn_id)
+                if entry.txn_id in committed_txns:
+                    redo.append(entry)
         
         # Phase 1: REDO all committed transactions
         print(f"\n🔄 REDO Phase:")
-        for txn_id in committed_txns:
-            print(f"  Redoing txn {txn_id}...")
-            for entry in transactions[txn_id]:
-                if entry.entry_type == LogEntryType.INSERT:
-                    storage[entry.key] = entry.value
-                    print(f"    INSERT {entry.key.hex()[:8]}...")
-                elif entry.entry_type == LogEntryType.UPDATE:
-                    storage[entry.key] = entry.value
-                    print(f"    UPDATE {entry.key.hex()[:8]}...")
-                elif entry.entry_type == LogEntryType.DELETE:
-                    if entry.key in storage:
-                        del storage[entry.key]
-                    print(f"    DELETE {entry.key.hex()[:8]}...")
+        if verbose:
+            for txn_id in committed_txns:
+                print(f"  Redoing txn {txn_id}...")
+                for entry in transactions[txn_id]:
+                    if entry.entry_type in _REDO:
+                        print(f"    {entry.entry_type.name} {entry.key.hex()[:8]}...")
+        self._redo(storage, redo)
         
         # Phase 2: UNDO all uncommitted transactions
         print(f"\n↩️  UNDO Phase:")
@@ -217,13 +424,11 @@ class WriteAheadLog:
             if txn_id not in committed_txns and txn_id != 0:
                 print(f"  Undoing uncommitted txn {txn_id}...")
                 for entry in reversed(entries):
-                    if entry.entry_type in [LogEntryType.INSERT, LogEntryType.UPDATE, LogEntryType.DELETE]:
+                    undo = _UNDO.get(entry.entry_type)
+                    if undo is not None:
+                        undo(storage, entry)
                         if entry.old_value is not None:
-                            storage[entry.key] = entry.old_value
-                            print(f"    UNDO {entry.entry_type.value} {entry.key.hex()[:8]}...")
-                        elif entry.entry_type == LogEntryType.INSERT:
-                            if entry.key in storage:
-                                del storage[entry.key]
+                            print(f"    UNDO {entry.entry_type.name} {entry.key.hex()[:8]}...")
         
         print(f"\n✅ Recovery complete!")
         print(f"   Committed transactions: {len(committed_txns)}")
@@ -231,47 +436,98 @@ class WriteAheadLog:
         
         return transactions
     
+    @staticmethod
+    def _redo(storage: Dict[bytes, bytes], entries: List[LogEntry]) -> None:
+        """
+        Apply committed entries to storage in log order (so the latest
+        write to a key wins), as one flat loop: no I/O, one table
+        dispatch per entry.
+        """
+        handler = _REDO.get
+        for entry in entries:
+            handler(entry.entry_type, _noop)(storage, entry)
+    
     def truncate(self) -> None:
         """
         Truncate WAL after checkpoint.
         
         Keep only entries after last checkpoint.
         Prevents WAL from growing forever.
+        
+        The kept entries go to a temp file that os.replace() swaps in, so
+        a crash leaves either the old log or the new one. The lock is
+        held throughout: once everything appended is durable, no batch
+        is in flight and none can start until the new file is in place.
         """
         entries_to_keep = []
         
-        with open(self.wal_file, 'rb') as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                entry = LogEntry.deserialize(line)
-                if entry.lsn >= self.last_checkpoint_lsn:
-                    entries_to_keep.append(line)
-        
-        # Rewrite WAL file
-        with open(self.wal_file, 'wb') as f:
-            for line in entries_to_keep:
-                f.write(line)
+        with self._cv:
+            # Buffered entries become part of the image we rewrite
+            self._wait_durable(self.next_lsn - 1)
+            
+            with self._map_log() as data:
+                for start, end, _, _, lsn in _iter_headers(data):
+                    if lsn >= self.last_checkpoint_lsn:
+                        entries_to_keep.append(data[start:end])  # Copied out: unmapped below
+            
+            tmp_file = self.wal_file + ".tmp"
+            fd = os.open(tmp_file, os.O_RDWR | os.O_APPEND | os.O_CREAT | os.O_TRUNC, 0o644)
+            old_fd, self.fd = self.fd, fd
+            try:
+                if entries_to_keep:
+                    self._write(entries_to_keep)
+                os.fsync(fd)
+                os.replace(tmp_file, self.wal_file)
+            except BaseException:
+                self.fd = old_fd
+                os.close(fd)
+                raise
+            os.close(old_fd)
         
         print(f"📝 WAL truncated: Kept {len(entries_to_keep)} entries after checkpoint")
     
     def _load_state(self) -> None:
-        """Load state from existing WAL file."""
+        """
+        Load state from existing WAL file.
+        
+        A torn or corrupt tail is cut off: appends (O_APPEND) would
+        otherwise land after it, where the scan never reaches them.
+        """
         max_lsn = -1
         last_checkpoint = 0
+        valid_end = 0
+        
+        with self._map_log() as data:
+            size = len(data)
+            for _, end, entry_type, _, lsn in _iter_headers(data):
+                max_lsn = max(max_lsn, lsn)
+                if entry_type == LogEntryType.CHECKPOINT:
+                    last_checkpoint = lsn
+                valid_end = end
         
-        if os.path.exists(self.wal_file):
-            with open(self.wal_file, 'rb') as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-                    entry = LogEntry.deserialize(line)
-                    max_lsn = max(max_lsn, entry.lsn)
-                    if entry.entry_type == LogEntryType.CHECKPOINT:
-                        last_checkpoint = entry.lsn
+        if valid_end < size:
+            os.ftruncate(self.fd, valid_end)
+            os.fsync(self.fd)
         
         self.next_lsn = max_lsn + 1
         self.last_checkpoint_lsn = last_checkpoint
+    
+    @contextmanager
+    def _map_log(self) -> Iterator[Any]:
+        """
+        Read-only mmap of the WAL through the open fd: scanning parses
+        headers straight out of the page cache, with no copy of the
+        file. Only decoded payloads are copied out.
+        """
+        size = os.fstat(self.fd).st_size
+        if size == 0:
+            yield b''  # mmap can't map an empty file
+            return
+        mm = mmap.mmap(self.fd, size, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
 
 
 # Example usage
@@ -322,4 +578,6 @@ if __name__ == "__main__":
     print(f"✅ Transaction 2 rolled back: user:3 does NOT exist")
     
     # Cleanup
+    wal.close()
+    wal2.close()
     os.remove(wal_file)
@@ -2,46 +2,37 @@
 Basic FIFO Queue Implementation
 Episode 1.8: Task Queue System - Layer 1
 
-A simple queue using a singly linked list.
+A simple queue on collections.deque: a doubly linked list of
+64-slot blocks (in C), so one allocation per ~64 jobs instead of a
+Node object per job.
 Operations: O(1) enqueue, O(1) dequeue
 """
 
-class Node:
-    """Node in the linked list"""
-    def __init__(self, job, next_node=None):
-        self.job = job
-        self.next = next_node
+from collections import deque
 
 
 class BasicQueue:
     """
-    FIFO Queue using singly linked list
+    FIFO Queue using a deque (linked list of blocks)
     
-    Maintains head (front) and tail (back) pointers
-    for O(1) enqueue and dequeue operations.
+    Enqueue at the right end (tail), dequeue from the
+    left end (head): both O(1).
     """
     
     def __init__(self):
-        self.head = None  # Front of queue (dequeue from here)
-        self.tail = None  # Back of queue (enqueue here)
-        self.size = 0
+        self._dq = deque()
+    
+    @property
+    def size(self):
+        """Number of jobs in queue"""
+        return len(self._dq)
     
     def enqueue(self, job):
         """
         Add job to back of queue
         Time: O(1)
         """
-        node = Node(job)
-        
-        if self.tail is None:
-            # Empty queue
-            self.head = self.tail = node
-        else:
-            # Add to tail
-            self.tail.next = node
-            self.tail = node
-        
-        self.size += 1
+        self._dq.append(job)
     
     def dequeue(self):
         """
@@ -49,38 +40,22 @@ class BasicQueue:
         Time: O(1)
         Returns: Job or None if empty
         """
-        if self.head is None:
-            return None  # Empty queue
-        
-        job = self.head.job
-        self.head = self.head.next
-        
-        if self.head is None:
-            # Queue is now empty
-            self.tail = None
-        
-        self.size -= 1
-        return job
+        return self._dq.popleft() if self._dq else None
     
     def peek(self):
         """View front job without removing"""
-        return self.head.job if self.head else None
+        return self._dq[0] if self._dq else None
     
     def is_empty(self):
         """Check if queue is empty"""
-        return self.size == 0
+        return not self._dq
     
     def __len__(self):
         """Return number of jobs in queue"""
-        return self.size
+        return len(self._dq)
     
     def __repr__(self):
-        jobs = []
-        current = self.head
-        while current:
-            jobs.append(str(current.job))
-            current = current.next
-        return f"BasicQueue([{', '.join(jobs)}])"
+        return f"BasicQueue([{', '.join(map(str, self._dq))}])"
 
 
 # Demo
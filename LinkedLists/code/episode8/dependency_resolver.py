@@ -6,7 +6,12 @@ DAG-based job dependencies with cycle detection.
 Prevents deadlocks through topological sorting.
 """
 
-from collections import defaultdict, deque
+from array import array
+import heapq
+from collections import defaultdict
+
+# DFS node colors: unvisited, on the current path, finished
+_WHITE, _GRAY, _BLACK = 0, 1, 2
 
 
 class CircularDependencyError(Exception):
@@ -23,8 +28,24 @@ class DependencyResolver:
     """
     
     def __init__(self):
-        self.graph = defaultdict(list)  # job_id -> [dependency_ids]
+        # Adjacency as insertion-ordered sets (dict keys): O(1) membership
+        # and removal, duplicate edges collapse, iteration order stays
+        # deterministic
+        self.graph = defaultdict(dict)  # job_id -> {dependency_id: None}
+        self.reverse = defaultdict(dict)  # dependency_id -> {dependent job_id: None}
         self.completed = set()  # Track completed jobs
+        
+        # Every known job -> number of dependencies, kept up to date by
+        # _add_edge so topological_sort starts from a copy
+        self._in_degree = {}
+        
+        # Incremental topological order (Pearce-Kelly): every job in the
+        # graph -> a distinct int, each dependency lower than its
+        # dependents. New dependents are numbered up from 0, new
+        # dependencies down from -1.
+        self._ord = {}
+        self._ord_hi = 0
+        self._ord_lo = -1
     
     def add_dependency(self, job_id, depends_on):
         """
@@ -37,54 +58,192 @@ class DependencyResolver:
         Raises:
             CircularDependencyError: If this creates a cycle
         """
-        if isinstance(depends_on, list):
-            for dep in depends_on:
-                self.graph[job_id].append(dep)
-        else:
-            self.graph[job_id].append(depends_on)
-        
-        # Check for cycles after adding dependency
-        if self.has_cycle():
-            # Rollback
-            if isinstance(depends_on, list):
-                for dep in depends_on:
-                    self.graph[job_id].remove(dep)
-            else:
-                self.graph[job_id].remove(depends_on)
-            
+        if not self.try_add_dependency(job_id, depends_on):
             raise CircularDependencyError(
                 f"Circular dependency detected: {job_id} -> {depends_on}"
             )
     
+    def try_add_dependency(self, job_id, depends_on):
+        """
+        Add dependency unless it would create a cycle (no exception)
+        
+        Args: as for add_dependency
+        
+        Returns: True if added, False if it would create a cycle (the
+            graph is left unchanged)
+        """
+        deps = depends_on if isinstance(depends_on, list) else [depends_on]
+        
+        # A cycle through two new edges would pass job_id twice, so
+        # checking each edge against the current graph is enough
+        for dep in deps:
+            if not self._reorder_for_edge(job_id, dep):
+                return False
+        
+        ord_ = self._ord
+        for dep in deps:
+            if dep not in ord_:
+                # No dependencies of its own: may go before everything
+                ord_[dep] = self._ord_lo
+                self._ord_lo -= 1
+            self._add_edge(job_id, dep)
+        if job_id not in ord_:
+            # No dependents yet: may go after everything
+            ord_[job_id] = self._ord_hi
+            self._ord_hi += 1
+        return True
+    
+    def add_dependencies_bulk(self, edges):
+        """
+        Add many dependencies with a single cycle check
+        
+        Args:
+            edges: Iterable of (job_id, depends_on) pairs, as for
+                add_dependency
+        
+        Raises:
+            CircularDependencyError: If the batch creates a cycle (none
+                of the batch is kept)
+        """
+        known_jobs = set(self._in_degree)
+        added = []
+        for job_id, depends_on in edges:
+            deps = depends_on if isinstance(depends_on, list) else [depends_on]
+            for dep in deps:
+                if self._add_edge(job_id, dep):
+                    added.append((job_id, dep))
+        
+        try:
+            order = self.topological_sort()
+        except CircularDependencyError:
+            # Rollback the whole batch (only edges it actually added)
+            graph, reverse, in_degree = self.graph, self.reverse, self._in_degree
+            for job_id, dep in added:
+                deps = graph[job_id]
+                dependents = reverse[dep]
+                del deps[dep]
+                del dependents[job_id]
+                in_degree[job_id] -= 1
+                if not deps:
+                    del graph[job_id]
+                if not dependents:
+                    del reverse[dep]
+            for job in [j for j in in_degree if j not in known_jobs]:
+                del in_degree[job]
+            
+            raise CircularDependencyError("Circular dependency detected in batch")
+        
+        # Renumber the incremental order from the fresh sort
+        self._ord = {job: i for i, job in enumerate(order)}
+        self._ord_hi = len(order)
+        self._ord_lo = -1
+    
+    def _add_edge(self, job_id, dep):
+        """Record job_id -> dep (no cycle check); False if already there"""
+        deps = self.graph[job_id]
+        if dep in deps:
+            return False
+        
+        deps[dep] = None
+        self.reverse[dep][job_id] = None
+        in_degree = self._in_degree
+        in_degree[job_id] = in_degree.get(job_id, 0) + 1
+        in_degree.setdefault(dep, 0)
+        return True
+    
+    def _reorder_for_edge(self, job_id, dep):
+        """
+        Make room in _ord for job_id -> dep (Pearce-Kelly)
+        
+        If dep is already ordered before job_id the edge is safe and
+        nothing is searched. Otherwise only jobs ordered between the two
+        are visited: dependents of job_id up to dep (reaching dep means a
+        cycle) and dependencies of dep down to job_id, which then swap
+        places within their own slots.
+        
+        Returns: False if the edge would close a cycle (order untouched)
+        """
+        if job_id == dep:
+            return False
+        
+        ord_ = self._ord
+        lo = ord_.get(job_id)
+        hi = ord_.get(dep)
+        if lo is None or hi is None or hi < lo:
+            return True  # A new job has no edges yet, or already in order
+        
+        # Forward: job_id and its dependents ordered before dep
+        reverse = self.reverse
+        forward = [job_id]
+        seen = {job_id}
+        stack = [job_id]
+        while stack:
+            for dependent in reverse.get(stack.pop(), ()):
+                position = ord_[dependent]
+                if position == hi:
+                    return False  # dep already depends on job_id
+                if position < hi and dependent not in seen:
+                    seen.add(dependent)
+                    forward.append(dependent)
+                    stack.append(dependent)
+        
+        # Backward: dep and its dependencies ordered after job_id
+        graph = self.graph
+        backward = [dep]
+        seen = {dep}
+        stack = [dep]
+        while stack:
+            for dependency in graph.get(stack.pop(), ()):
+                if ord_[dependency] > lo and dependency not in seen:
+                    seen.add(dependency)
+                    backward.append(dependency)
+                    stack.append(dependency)
+        
+        # Backward set takes the lowest of the combined slots
+        position_of = ord_.__getitem__
+        backward.sort(key=position_of)
+        forward.sort(key=position_of)
+        moved = backward + forward
+        slots = sorted(map(position_of, moved))
+        for job, position in zip(moved, slots):
+            ord_[job] = position
+        return True
+    
     def has_cycle(self):
         """
         Detect cycles using DFS
         
+        Iterative three-color DFS: an explicit stack of (node, neighbor
+        iterator) instead of recursion, so a long dependency chain can't
+        hit the interpreter's recursion limit.
+        
         Returns: True if cycle exists, False otherwise
         """
-        visited = set()
-        rec_stack = set()  # Recursion stack to detect back edges
+        graph = self.graph
+        state = {}  # node -> color, missing = _WHITE
         
-        def dfs(node):
-            visited.add(node)
-            rec_stack.add(node)
+        # Check from all nodes
+        for root in list(graph):
+            if state.get(root, _WHITE) != _WHITE:
+                continue
+            state[root] = _GRAY
+            stack = [(root, iter(graph.get(root, ())))]
             
-            for neighbor in self.graph.get(node, []):
-                if neighbor not in visited:
-                    if dfs(neighbor):
+            while stack:
+                node, neighbors = stack[-1]
+                for neighbor in neighbors:
+                    color = state.get(neighbor, _WHITE)
+                    if color == _GRAY:
+                        # Back edge found -> cycle!
                         return True
-                elif neighbor in rec_stack:
-                    # Back edge found -> cycle!
-                    return True
-            
-            rec_stack.remove(node)
-            return False
-        
-        # Check from all nodes
-        for node in list(self.graph.keys()):
-            if node not in visited:
-                if dfs(node):
-                    return True
+                    if color == _WHITE:
+                        state[neighbor] = _GRAY
+                        stack.append((neighbor, iter(graph.get(neighbor, ()))))
+                        break
+                else:
+                    # All neighbors done
+                    state[node] = _BLACK
+                    stack.pop()
         
         return False
     
@@ -94,48 +253,137 @@ class DependencyResolver:
         
         Returns: True if all dependencies completed
         """
-        dependencies = self.graph.get(job_id, [])
-        return all(dep in self.completed for dep in dependencies)
+        dependencies = self.graph.get(job_id)
+        return not dependencies or dependencies.keys() <= self.completed
     
     def mark_complete(self, job_id):
         """Mark job as completed"""
         self.completed.add(job_id)
     
-    def topological_sort(self):
+    def dependents_of(self, job_id):
+        """Jobs that directly depend on job_id (in the order added)"""
+        return self.reverse.get(job_id, {}).keys()
+    
+    def topological_sort(self, priorities=None):
         """
         Return jobs in dependency order (Kahn's algorithm)
         
+        Edges run dependency -> dependent: a job's in-degree is its number
+        of dependencies, and finishing a job only visits its own
+        dependents (via self.reverse). O(V+E).
+        
+        Args:
+            priorities: Optional dict job_id -> rank (lower runs first,
+                e.g. HIGH=0, MEDIUM=1, LOW=2; missing jobs rank 0). Among
+                ready jobs the lowest rank goes next, ties in first-seen
+                order. O(V log V + E).
+        
         Returns: List of job_ids in execution order
         """
-        # Calculate in-degree for each node
-        in_degree = defaultdict(int)
-        all_jobs = set(self.graph.keys())
+        if priorities is not None:
+            return self._topological_sort_by_priority(priorities)
         
-        for job_id in self.graph:
-            for dep in self.graph[job_id]:
-                in_degree[dep] += 1
-                all_jobs.add(dep)
+        # In-degree = number of dependencies (maintained incrementally;
+        # every known job, in first-seen order)
+        in_degree = self._in_degree.copy()
         
         # Start with jobs that have no dependencies
-        queue = deque([job for job in all_jobs if in_degree[job] == 0])
+        result = [job for job, degree in in_degree.items() if degree == 0]
+        dependents_of = self.reverse.get
+        
+        # The result list doubles as the FIFO queue: iteration picks up
+        # jobs appended behind the cursor
+        for job in result:
+            # Reduce in-degree for dependent jobs
+            for dependent in dependents_of(job, ()):
+                remaining = in_degree[dependent] - 1
+                in_degree[dependent] = remaining
+                if remaining == 0:
+                    result.append(dependent)
+        
+        if len(result) != len(in_degree):
+            raise CircularDependencyError("Cycle detected during topological sort")
+        
+        return result
+    
+    def _topological_sort_by_priority(self, priorities):
+        """Kahn's algorithm with a (rank, first-seen index) heap as the ready set"""
+        in_degree = self._in_degree.copy()
+        seq = {job: i for i, job in enumerate(in_degree)}
+        rank = priorities.get
+        
+        ready = [(rank(job, 0), seq[job], job)
+                 for job, degree in in_degree.items() if degree == 0]
+        heapq.heapify(ready)
         result = []
+        dependents_of = self.reverse.get
         
-        while queue:
-            job = queue.popleft()
+        while ready:
+            job = heapq.heappop(ready)[2]
             result.append(job)
             
-            # Reduce in-degree for dependent jobs
-            for dependent in self.graph:
-                if job in self.graph[dependent]:
-                    in_degree[dependent] -= 1
-                    if in_degree[dependent] == 0:
-                        queue.append(dependent)
+            for dependent in dependents_of(job, ()):
+                remaining = in_degree[dependent] - 1
+                in_degree[dependent] = remaining
+                if remaining == 0:
+                    heapq.heappush(ready, (rank(dependent, 0), seq[dependent], dependent))
         
-        if len(result) != len(all_jobs):
+        if len(result) != len(in_degree):
             raise CircularDependencyError("Cycle detected during topological sort")
         
         return result
     
+    def to_csr(self):
+        """
+        Snapshot the graph in CSR form over integer job ids
+        
+        Edges run dependency -> dependent, packed into two C int arrays
+        (4 bytes per edge instead of a dict slot per edge and per side).
+        
+        Returns: (names, indptr, indices) - the dependents of names[i]
+            are names[j] for j in indices[indptr[i]:indptr[i + 1]]
+        """
+        names = list(self._in_degree)
+        ids = {name: i for i, name in enumerate(names)}
+        reverse = self.reverse
+        
+        indptr = array('i', [0])
+        indices = array('i')
+        for name in names:
+            dependents = reverse.get(name)
+            if dependents:
+                indices.extend([ids[job] for job in dependents])
+            indptr.append(len(indices))
+        
+        return names, indptr, indices
+    
+    def topological_sort_csr(self):
+        """
+        Kahn's algorithm over the CSR snapshot (same order as
+        topological_sort)
+        
+        Works on int arrays only; the order array doubles as the queue.
+        
+        Returns: List of job_ids in execution order
+        """
+        names, indptr, indices = self.to_csr()
+        in_degree = array('i', self._in_degree.values())  # Same order as names
+        order = array('i', [i for i, degree in enumerate(in_degree) if degree == 0])
+        
+        head = 0
+        while head < len(order):
+            node = order[head]
+            head += 1
+            for dependent in indices[indptr[node]:indptr[node + 1]]:
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    order.append(dependent)
+        
+        if len(order) != len(names):
+            raise CircularDependencyError("Cycle detected during topological sort")
+        
+        return [names[i] for i in order]
+    
     def get_ready_jobs(self, pending_jobs):
         """
         Get list of jobs ready to run (dependencies satisfied)
@@ -145,11 +393,14 @@ class DependencyResolver:
         
         Returns: List of job_ids that can run now
         """
-        ready = []
-        for job_id in pending_jobs:
-            if self.can_run(job_id):
-                ready.append(job_id)
-        return ready
+        # Dependency sets are dict keys, so "all deps completed" is one
+        # C-level subset test per job
+        graph = self.graph
+        completed = self.completed
+        return [
+            job_id for job_id in pending_jobs
+            if job_id not in graph or graph[job_id].keys() <= completed
+        ]
 
 
 # Demo
@@ -280,7 +531,13 @@ if __name__ == "__main__":
     
     order = resolver6.topological_sort()
     print(f"\n  Execution order: {order}")
-    print(f"  ✅ Dependencies satisfied!\n")
+    print(f"  ✅ Dependencies satisfied!")
+    
+    # Same DAG, but visualize is HIGH and analyze is LOW priority
+    ranks = {"visualize": 0, "analyze": 2}
+    order = resolver6.topological_sort(priorities=ranks)
+    print(f"  With priorities {ranks}: {order}")
+    print(f"  ✅ HIGH sibling runs first\n")
     
     # Performance test
     print("=== Performance Test ===")
@@ -302,4 +559,10 @@ if __name__ == "__main__":
     elapsed = time.time() - start
     
     print(f"Topological sort of {n:,} jobs in {elapsed:.3f}s")
+    
+    start = time.time()
+    assert resolver_perf.topological_sort_csr() == order
+    elapsed = time.time() - start
+    
+    print(f"CSR topological sort of {n:,} jobs in {elapsed:.3f}s")
     print(f"✅ O(V+E) complexity confirmed!")
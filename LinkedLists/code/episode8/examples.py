@@ -40,12 +40,14 @@ def example_1_web_scraping():
         "https://shop.com/airpods-pro",
     ]
     
-    for url in featured_urls:
-        queue.submit(
-            task_id=f"scrape_{url.split('/')[-1]}",
-            data={"url": url, "type": "product"},
-            priority=TaskPriority.HIGH
-        )
+    queue.submit_many(
+        {
+            "task_id": f"scrape_{url.split('/')[-1]}",
+            "data": {"url": url, "type": "product"},
+            "priority": TaskPriority.HIGH,
+        }
+        for url in featured_urls
+    )
     
     # Regular products (low priority, process after featured)
     regular_urls = [
@@ -54,12 +56,14 @@ def example_1_web_scraping():
         "https://shop.com/screen-protector",
     ]
     
-    for url in regular_urls:
-        queue.submit(
-            task_id=f"scrape_{url.split('/')[-1]}",
-            data={"url": url, "type": "product"},
-            priority=TaskPriority.LOW
-        )
+    queue.submit_many(
+        {
+            "task_id": f"scrape_{url.split('/')[-1]}",
+            "data": {"url": url, "type": "product"},
+            "priority": TaskPriority.LOW,
+        }
+        for url in regular_urls
+    )
     
     print("\nProcessing scraping tasks...")
     processed = queue.process_all()
@@ -109,13 +113,15 @@ def example_2_data_pipeline():
     ]
     
     print("\nSubmitting pipeline tasks...")
-    for task_id, description, deps, priority in pipeline_stages:
-        queue.submit(
-            task_id=task_id,
-            data={"description": description},
-            priority=priority,
-            dependencies=deps
-        )
+    queue.submit_many(
+        {
+            "task_id": task_id,
+            "data": {"description": description},
+            "priority": priority,
+            "dependencies": deps,
+        }
+        for task_id, description, deps, priority in pipeline_stages
+    )
     
     print("\nProcessing pipeline (respects dependencies)...")
     processed = queue.process_all()
@@ -150,8 +156,10 @@ def example_3_notification_system():
         ("email_payment_receipt", "Payment confirmation", TaskPriority.HIGH),
     ]
     
-    for task_id, description, priority in critical_notifications:
-        queue.submit(task_id=task_id, data=description, priority=priority)
+    queue.submit_many(
+        {"task_id": task_id, "data": description, "priority": priority}
+        for task_id, description, priority in critical_notifications
+    )
     
     # SMS notifications (rate limited)
     sms_notifications = [
@@ -159,8 +167,10 @@ def example_3_notification_system():
         ("sms_alert", "Security alert", TaskPriority.HIGH),
     ]
     
-    for task_id, description, priority in sms_notifications:
-        queue.submit(task_id=task_id, data=description, priority=priority)
+    queue.submit_many(
+        {"task_id": task_id, "data": description, "priority": priority}
+        for task_id, description, priority in sms_notifications
+    )
     
     # Push notifications (best effort, low priority)
     push_notifications = [
@@ -168,8 +178,10 @@ def example_3_notification_system():
         ("push_friend_request", "Friend request", TaskPriority.LOW),
     ]
     
-    for task_id, description, priority in push_notifications:
-        queue.submit(task_id=task_id, data=description, priority=priority)
+    queue.submit_many(
+        {"task_id": task_id, "data": description, "priority": priority}
+        for task_id, description, priority in push_notifications
+    )
     
     print("\nProcessing notifications...")
     processed = queue.process_all()
@@ -207,41 +219,41 @@ def example_4_background_jobs():
     for video_id, title in videos:
         # 1. Upload task
         upload_task = f"upload_{video_id}"
-        queue.submit(
-            task_id=upload_task,
-            data={"title": title, "stage": "upload"},
-            priority=TaskPriority.HIGH
-        )
+        video_tasks = [{
+            "task_id": upload_task,
+            "data": {"title": title, "stage": "upload"},
+            "priority": TaskPriority.HIGH,
+        }]
         
         # 2. Generate thumbnails (fast, depends on upload)
-        thumbnail_task = f"thumbnail_{video_id}"
-        queue.submit(
-            task_id=thumbnail_task,
-            data={"title": title, "stage": "thumbnail"},
-            priority=TaskPriority.MEDIUM,
-            dependencies=[upload_task]
-        )
+        video_tasks.append({
+            "task_id": f"thumbnail_{video_id}",
+            "data": {"title": title, "stage": "thumbnail"},
+            "priority": TaskPriority.MEDIUM,
+            "dependencies": [upload_task],
+        })
         
         # 3. Transcode (slow, depends on upload)
         transcode_tasks = []
         for fmt in ["720p", "1080p", "4K"]:
             transcode_task = f"transcode_{video_id}_{fmt}"
             transcode_tasks.append(transcode_task)
-            queue.submit(
-                task_id=transcode_task,
-                data={"title": title, "stage": f"transcode_{fmt}"},
-                priority=TaskPriority.MEDIUM,
-                dependencies=[upload_task]
-            )
+            video_tasks.append({
+                "task_id": transcode_task,
+                "data": {"title": title, "stage": f"transcode_{fmt}"},
+                "priority": TaskPriority.MEDIUM,
+                "dependencies": [upload_task],
+            })
         
         # 4. Generate subtitles (depends on transcode completing)
-        subtitle_task = f"subtitles_{video_id}"
-        queue.submit(
-            task_id=subtitle_task,
-            data={"title": title, "stage": "subtitles"},
-            priority=TaskPriority.LOW,
-            dependencies=transcode_tasks
-        )
+        video_tasks.append({
+            "task_id": f"subtitles_{video_id}",
+            "data": {"title": title, "stage": "subtitles"},
+            "priority": TaskPriority.LOW,
+            "dependencies": transcode_tasks,
+        })
+        
+        queue.submit_many(video_tasks)
     
     print("\nProcessing video jobs...")
     processed = queue.process_all()
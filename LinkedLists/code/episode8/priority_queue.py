@@ -5,22 +5,42 @@ Episode 1.8: Task Queue System - Layer 2
 Multiple queues for different priority levels with fair scheduling.
 """
 
-from basic_queue import BasicQueue
+import itertools
+from collections import deque
 
 
 class PriorityQueue:
     """
     Priority-based task queue with fair scheduling
     
-    Maintains separate queues for each priority level.
+    Maintains separate queues for each priority level (plain deques:
+    each enqueue/dequeue is one C call, no wrapper in between).
     Implements weighted round-robin to prevent starvation.
+    
+    Thread-safe without a lock: deque.append/popleft and advancing the
+    schedule iterator are each a single atomic C call, and a queue
+    emptied by another thread between the check and the pop is treated
+    as empty.
     """
     
     def __init__(self):
-        self.high = BasicQueue()
-        self.medium = BasicQueue()
-        self.low = BasicQueue()
-        self.dequeue_counter = 0  # For fair scheduling
+        self.high = deque()
+        self.medium = deque()
+        self.low = deque()
+        
+        # Fair scheduling pattern: H H H M M L (repeats)
+        self._schedule = itertools.cycle(
+            (self.high,) * 3 + (self.medium,) * 2 + (self.low,)
+        )
+        self._by_rank = (self.high, self.medium, self.low)
+        
+        # priority -> queue; other spellings and enum members are
+        # added on first use, so enqueue is one dict lookup
+        self._by_priority = {
+            "HIGH": self.high,
+            "MEDIUM": self.medium,
+            "LOW": self.low,
+        }
     
     def enqueue(self, job, priority="MEDIUM"):
         """
@@ -28,18 +48,36 @@ class PriorityQueue:
         
         Args:
             job: Job to enqueue
-            priority: "HIGH", "MEDIUM", or "LOW"
+            priority: "HIGH", "MEDIUM", or "LOW" (any case), or an enum
+                member with one of those names (e.g. TaskPriority.HIGH)
         """
-        priority = priority.upper()
+        queue = self._by_priority.get(priority)
+        if queue is None:
+            queue = self._resolve_priority(priority)
+        queue.append(job)
+    
+    def enqueue_many(self, jobs, priority="MEDIUM"):
+        """
+        Add several jobs of one priority with a single extend
         
-        if priority == "HIGH":
-            self.high.enqueue(job)
-        elif priority == "MEDIUM":
-            self.medium.enqueue(job)
-        elif priority == "LOW":
-            self.low.enqueue(job)
-        else:
+        Args:
+            jobs: Iterable of jobs, kept in order
+            priority: As for enqueue
+        """
+        queue = self._by_priority.get(priority)
+        if queue is None:
+            queue = self._resolve_priority(priority)
+        queue.extend(jobs)
+    
+    def _resolve_priority(self, priority):
+        """Map a new priority spelling to its queue and cache it"""
+        name = getattr(priority, "name", priority)
+        queue = self._by_priority.get(name.upper()) if isinstance(name, str) else None
+        if queue is None:
             raise ValueError(f"Invalid priority: {priority}")
+        
+        self._by_priority[priority] = queue
+        return queue
     
     def dequeue(self):
         """
@@ -50,47 +88,32 @@ class PriorityQueue:
         
         Returns: Job or None if all queues empty
         """
-        # Pattern: H H H M M L (repeats)
-        position = self.dequeue_counter % 6
-        self.dequeue_counter += 1
-        
-        if position < 3:  # Positions 0, 1, 2: Try HIGH
-            job = self.high.dequeue()
-            if job:
-                return job
-        elif position < 5:  # Positions 3, 4: Try MEDIUM
-            job = self.medium.dequeue()
-            if job:
-                return job
-        else:  # Position 5: Try LOW
-            job = self.low.dequeue()
-            if job:
-                return job
+        queue = next(self._schedule)
+        if queue:
+            try:
+                return queue.popleft()
+            except IndexError:
+                pass  # Lost a race for the last job
         
         # Fallback: Try any available queue
-        for queue in [self.high, self.medium, self.low]:
-            job = queue.dequeue()
-            if job:
-                return job
-        
-        return None  # All queues empty
+        return self.dequeue_strict()
     
     def dequeue_strict(self):
         """
         Strict priority: Always dequeue highest priority available
         WARNING: Can starve low-priority jobs!
         """
-        for queue in [self.high, self.medium, self.low]:
-            job = queue.dequeue()
-            if job:
-                return job
-        return None
+        for queue in self._by_rank:
+            if queue:
+                try:
+                    return queue.popleft()
+                except IndexError:
+                    continue
+        return None  # All queues empty
     
     def is_empty(self):
         """Check if all queues are empty"""
-        return (self.high.is_empty() and 
-                self.medium.is_empty() and 
-                self.low.is_empty())
+        return not (self.high or self.medium or self.low)
     
     def size_by_priority(self):
         """Return dict of queue sizes by priority"""
@@ -178,16 +201,19 @@ if __name__ == "__main__":
     n = 50_000
     
     import time
-    start = time.time()
-    for i in range(n):
-        priority = random.choice(["HIGH", "MEDIUM", "LOW"])
-        pq.enqueue(f"job_{i}", priority)
-    enqueue_time = time.time() - start
+    # Build jobs and priorities up front so only queue ops are timed
+    work = [(f"job_{i}", random.choice(["HIGH", "MEDIUM", "LOW"])) for i in range(n)]
     
-    start = time.time()
-    while not pq.is_empty():
+    start = time.perf_counter()
+    for job, priority in work:
+        pq.enqueue(job, priority)
+    enqueue_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for _ in range(n):
         pq.dequeue()
-    dequeue_time = time.time() - start
+    dequeue_time = time.perf_counter() - start
+    assert pq.is_empty()
     
     print(f"Enqueued {n:,} jobs in {enqueue_time:.3f}s ({n/enqueue_time:,.0f} ops/sec)")
     print(f"Dequeued {n:,} jobs in {dequeue_time:.3f}s ({n/dequeue_time:,.0f} ops/sec)")
@@ -7,86 +7,207 @@ Prevents abuse and controls resource consumption.
 """
 
 import time
+from array import array
 from collections import OrderedDict
 
-
-class LRUCache:
-    """
-    LRU Cache from Episode 5
-    Used to track recent requests per user
-    """
-    
-    def __init__(self, capacity):
-        self.cache = OrderedDict()
-        self.capacity = capacity
-    
-    def get(self, key):
-        if key not in self.cache:
-            return None
-        # Move to end (most recently used)
-        self.cache.move_to_end(key)
-        return self.cache[key]
-    
-    def put(self, key, value):
-        if key in self.cache:
-            self.cache.move_to_end(key)
-        self.cache[key] = value
-        if len(self.cache) > self.capacity:
-            # Evict least recently used
-            self.cache.popitem(last=False)
+# Clocks are time.monotonic_ns(): integer math, immune to wall-clock jumps
+_NS = 1_000_000_000
 
 
 class RateLimiter:
     """
-    Rate limiter using LRU cache + sliding window
+    Rate limiter using LRU cache + sliding window counter
+    
+    Tracks requests per user_id and enforces limits. Instead of one
+    timestamp per request, each user keeps two counters (previous and
+    current fixed window); the sliding window's count is estimated as
+    the current count plus the share of the previous window it still
+    overlaps. O(1) time and memory per user, whatever the limit.
+    
+    The LRU cache (Episode 5) is an OrderedDict used inline: front =
+    least recently used, move_to_end on access, popitem(last=False)
+    to evict.
     
-    Tracks requests per user_id and enforces limits.
-    Old timestamps automatically evicted from LRU cache.
+    check() is specialized per instance: a closure with the limit,
+    window and cache methods bound as locals, rebuilt when limit is set.
+    
+    Users idle for over a full window have nothing left to count; they
+    are expired lazily from the LRU end, a few at a time on every 16th
+    new user, rather than lingering until capacity forces eviction.
     """
     
     def __init__(self, max_requests_per_minute=100, capacity=10000):
-        # LRU cache: user_id -> list of timestamps
-        self.cache = LRUCache(capacity)
-        self.limit = max_requests_per_minute
+        # LRU cache: user_id -> [window index, previous count, current count]
+        self.cache = OrderedDict()
+        self.capacity = capacity
         self.window = 60  # seconds
+        self._window_ns = self.window * _NS
+        self.limit = max_requests_per_minute  # Builds self.check
+    
+    @property
+    def limit(self):
+        """Max requests per window"""
+        return self._limit
+    
+    @limit.setter
+    def limit(self, value):
+        self._limit = value
+        self.check = self._specialize_check()
+    
+    def _specialize_check(self):
+        """Build check() with this instance's constants bound as locals"""
+        limit = self._limit
+        window = self._window_ns
+        limit_scaled = limit * window
+        cache = self.cache
+        get = cache.get
+        move_to_end = cache.move_to_end
+        expire_idle = self._expire_idle
+        monotonic_ns = time.monotonic_ns
+        
+        def check(user_id):
+            """
+            Check if user is within rate limit
+            
+            Returns: True if allowed, False if rate limited
+            """
+            now = monotonic_ns()
+            index = now // window
+            
+            # Get recent requests from cache (O(1) lookup!)
+            counts = get(user_id)
+            
+            if counts is None:
+                size = len(cache)
+                if size >= self.capacity:
+                    # Evict least recently used
+                    cache.popitem(last=False)
+                elif not size & 15:
+                    expire_idle(index)
+                counts = cache[user_id] = [index, 0, 0]
+            else:
+                # Move to end (most recently used)
+                move_to_end(user_id)
+            
+            start, previous, current = counts
+            if start != index:
+                # Entered a new fixed window: current becomes previous (or
+                # both are stale if more than one window went by)
+                previous = current if start == index - 1 else 0
+                current = 0
+                counts[:] = (index, previous, current)
+            
+            # The estimate never exceeds previous + current, so only near the
+            # limit is the exact test needed - in integers, scaled by window:
+            # previous * (1 - offset / window) + current >= limit
+            if previous + current >= limit:
+                offset = now - index * window
+                if previous * (window - offset) + current * window >= limit_scaled:
+                    # Rate limit exceeded!
+                    return False
+            
+            # Count this request
+            counts[2] = current + 1
+            
+            return True  # Allowed
+        
+        return check
     
-    def check(self, user_id):
+    def _expire_idle(self, index, batch=16):
         """
-        Check if user is within rate limit
+        Drop up to batch users whose last request is over a window old
         
-        Returns: True if allowed, False if rate limited
+        Every access moves a user to the end and stamps the current
+        window, so the LRU end is also the stalest: stop at the first
+        user still inside the sliding window.
         """
-        now = time.time()
-        
-        # Get recent requests from cache (O(1) lookup!)
-        requests = self.cache.get(user_id)
+        cache = self.cache
+        for _ in range(batch):
+            if not cache:
+                break
+            user_id = next(iter(cache))
+            if cache[user_id][0] >= index - 1:
+                break
+            del cache[user_id]
+    
+    def check_batch(self, user_ids):
+        """
+        Check a batch of requests arriving together
         
-        if requests is None:
-            requests = []
+        Same logic as check(), but the clock is read once and every
+        attribute/method lookup is hoisted out of the loop.
         
-        # Sliding window: Remove old requests outside window
-        requests = [t for t in requests if now - t < self.window]
+        Returns: List of True (allowed) / False (rate limited), in order
+        """
+        now = time.monotonic_ns()
+        window = self._window_ns
+        index = now // window
+        previous_share = window - (now - index * window)
+        limit = self.limit
+        limit_scaled = limit * window
+        capacity = self.capacity
         
-        if len(requests) >= self.limit:
-            # Rate limit exceeded!
-            return False
+        cache = self.cache
+        get = cache.get
+        move_to_end = cache.move_to_end
+        results = []
+        append = results.append
         
-        # Add new request timestamp
-        requests.append(now)
-        self.cache.put(user_id, requests)
+        for user_id in user_ids:
+            counts = get(user_id)
+            if counts is None:
+                size = len(cache)
+                if size >= capacity:
+                    cache.popitem(last=False)
+                elif not size & 15:
+                    self._expire_idle(index)
+                counts = cache[user_id] = [index, 0, 0]
+            else:
+                move_to_end(user_id)
+            
+            start, previous, current = counts
+            if start != index:
+                previous = current if start == index - 1 else 0
+                current = 0
+                counts[:] = (index, previous, current)
+            
+            if (previous + current >= limit
+                    and previous * previous_share + current * window >= limit_scaled):
+                append(False)
+            else:
+                counts[2] = current + 1
+                append(True)
         
-        return True  # Allowed
+        return results
     
     def get_remaining(self, user_id):
         """Get remaining requests for user"""
-        now = time.time()
-        requests = self.cache.get(user_id) or []
-        requests = [t for t in requests if now - t < self.window]
-        return max(0, self.limit - len(requests))
+        counts = self.cache.get(user_id)
+        if counts is None:
+            return self.limit
+        self.cache.move_to_end(user_id)
+        
+        window = self._window_ns
+        index, offset = divmod(time.monotonic_ns(), window)
+        start, previous, current = counts
+        if start != index:
+            previous = current if start == index - 1 else 0
+            current = 0
+        
+        # floor(limit - estimated count)
+        spare = self.limit * window - previous * (window - offset) - current * window
+        return max(0, spare // window)
     
     def reset(self, user_id):
         """Reset rate limit for user"""
-        self.cache.put(user_id, [])
+        index = time.monotonic_ns() // self._window_ns
+        if user_id in self.cache:
+            self.cache[user_id][:] = (index, 0, 0)
+            self.cache.move_to_end(user_id)
+        else:
+            if len(self.cache) >= self.capacity:
+                self.cache.popitem(last=False)
+            self.cache[user_id] = [index, 0, 0]
 
 
 class TokenBucketLimiter:
@@ -94,39 +215,137 @@ class TokenBucketLimiter:
     Alternative: Token bucket algorithm
     
     Allows bursts while maintaining average rate.
+    
+    Tokens are fixed-point ints (1 token = _NS units), so refilling
+    from a monotonic_ns() delta is just elapsed_ns * rate.
+    
+    Bucket state is struct-of-arrays: user_id -> row, with tokens and
+    last-update times in two int64 arrays (16 bytes per user instead of
+    a tuple of two boxed ints).
+    
+    check() is specialized per instance like RateLimiter's, rebuilt
+    when rate or burst_size is set.
     """
     
     def __init__(self, rate_per_second=10, burst_size=20):
-        self.rate = rate_per_second  # Tokens added per second
-        self.burst_size = burst_size  # Max tokens in bucket
-        self.buckets = {}  # user_id -> (tokens, last_update)
+        self._rows = {}  # user_id -> row in the arrays below
+        self._tokens = array('q')  # Token units per row
+        self._last = array('q')  # Last update (monotonic ns) per row
+        self._rate = rate_per_second
+        self.burst_size = burst_size  # Builds self.check
+    
+    @property
+    def rate(self):
+        """Tokens added per second"""
+        return self._rate
+    
+    @rate.setter
+    def rate(self, value):
+        self._rate = value
+        self.check = self._specialize_check()
+    
+    @property
+    def burst_size(self):
+        """Max tokens in bucket"""
+        return self._burst_size
+    
+    @burst_size.setter
+    def burst_size(self, value):
+        self._burst_size = value
+        self.check = self._specialize_check()
+    
+    def _specialize_check(self):
+        """Build check() with this instance's constants bound as locals"""
+        rate = self._rate
+        full = int(self._burst_size * _NS)  # burst_size may be fractional
+        rows = self._rows
+        tokens_of = self._tokens
+        last_of = self._last
+        monotonic_ns = time.monotonic_ns
+        
+        def check(user_id):
+            """
+            Check if user has tokens available
+            
+            Returns: True if allowed (token consumed), False if rate limited
+            """
+            now = monotonic_ns()
+            
+            row = rows.get(user_id)
+            if row is None:
+                # New user: start with full bucket
+                rows[user_id] = len(tokens_of)
+                tokens_of.append(full - _NS)
+                last_of.append(now)
+                return True
+            
+            # Refill bucket based on time elapsed (units per ns == tokens per s)
+            tokens = min(full, tokens_of[row] + int((now - last_of[row]) * rate))
+            
+            if tokens < _NS:
+                # No tokens available
+                return False
+            
+            # Consume one token
+            tokens_of[row] = tokens - _NS
+            last_of[row] = now
+            return True
+        
+        return check
     
-    def check(self, user_id):
+    def refill_all(self, now=None):
         """
-        Check if user has tokens available
+        Bring every bucket up to date in one pass over the arrays
         
-        Returns: True if allowed (token consumed), False if rate limited
+        check() refills lazily, so this never changes a decision; it is
+        for maintenance (e.g. before reporting token levels).
         """
-        now = time.time()
-        
-        if user_id not in self.buckets:
-            # New user: start with full bucket
-            self.buckets[user_id] = (self.burst_size - 1, now)
-            return True
+        if now is None:
+            now = time.monotonic_ns()
+        full = int(self._burst_size * _NS)
+        rate = self._rate
         
-        tokens, last_update = self.buckets[user_id]
+        # Slice-assign: check() holds references to these arrays
+        self._tokens[:] = array('q', [
+            min(full, tokens + int((now - last) * rate))
+            for tokens, last in zip(self._tokens, self._last)
+        ])
+        self._last[:] = array('q', [now]) * len(self._last)
+    
+    def check_batch(self, user_ids):
+        """
+        Check a batch of requests arriving together (one clock read)
         
-        # Refill bucket based on time elapsed
-        elapsed = now - last_update
-        tokens = min(self.burst_size, tokens + elapsed * self.rate)
+        Returns: List of True (token consumed) / False, in order
+        """
+        now = time.monotonic_ns()
+        full = int(self.burst_size * _NS)
+        rate = self.rate
+        rows = self._rows
+        tokens_of = self._tokens
+        last_of = self._last
+        results = []
+        append = results.append
         
-        if tokens < 1:
-            # No tokens available
-            return False
+        for user_id in user_ids:
+            row = rows.get(user_id)
+            if row is None:
+                rows[user_id] = len(tokens_of)
+                tokens_of.append(full - _NS)
+                last_of.append(now)
+                append(True)
+                continue
+            
+            tokens = min(full, tokens_of[row] + int((now - last_of[row]) * rate))
+            if tokens < _NS:
+                append(False)
+                continue
+            
+            tokens_of[row] = tokens - _NS
+            last_of[row] = now
+            append(True)
         
-        # Consume one token
-        self.buckets[user_id] = (tokens - 1, now)
-        return True
+        return results
 
 
 # Demo
@@ -210,12 +429,14 @@ if __name__ == "__main__":
     
     import random
     n = 50_000
+    # Build the id pool once; the loop only picks from it
+    ids = [f"user_{i}" for i in range(1, 1001)]
+    picks = random.choices(ids, k=n)
     start = time.time()
     
     allowed = 0
     denied = 0
-    for i in range(n):
-        user_id = f"user_{random.randint(1, 1000)}"
+    for user_id in picks:
         if limiter.check(user_id):
             allowed += 1
         else:
@@ -225,4 +446,16 @@ if __name__ == "__main__":
     
     print(f"Checked {n:,} requests in {elapsed:.3f}s ({n/elapsed:,.0f} checks/sec)")
     print(f"Allowed: {allowed:,}, Denied: {denied:,}")
+    
+    # Same workload as one batch: ids generated up front, one call
+    batch_limiter = RateLimiter(max_requests_per_minute=1000, capacity=10000)
+    user_ids = random.choices(ids, k=n)
+    
+    start = time.perf_counter()
+    results = batch_limiter.check_batch(user_ids)
+    elapsed = time.perf_counter() - start
+    
+    allowed = sum(results)
+    print(f"Batch-checked {n:,} requests in {elapsed:.3f}s ({n/elapsed:,.0f} checks/sec)")
+    print(f"Allowed: {allowed:,}, Denied: {n - allowed:,}")
     print(f"✅ O(1) amortized with LRU cache!")
@@ -7,21 +7,26 @@ to handle transient failures gracefully. This prevents cascading failures and
 allows systems to recover from temporary issues.
 
 Time Complexity:
-- schedule_retry(): O(1) - add to retry queue
+- schedule_retry(): O(log n) - push onto the retry heap
 - move_to_dlq(): O(1) - move to dead letter queue
-- get_retryable_tasks(): O(n) - scan all retry tasks
+- get_retryable_tasks(): O(k log n) - pop the k tasks that became due
+- iter_retryable(): same, but yields them lazily (no list built)
+- remove_from_retry_queue(): O(1) - entries indexed by task id
 
 Connection to Earlier Episodes:
 - Uses BasicQueue from Layer 1 (Episode 8, Slide 5)
 - Builds on priority queue concepts (Episode 8, Slide 7)
 """
 
+import heapq
+import itertools
 import time
+from collections import deque
 from typing import Any, Optional, Dict, List
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)  # No per-task __dict__
 class Task:
     """Represents a task in the queue system."""
     id: str
@@ -37,13 +42,6 @@ class Task:
         self.errors.append(f"{time.time():.2f}: {error}")
 
 
-class Node:
-    """Node for linked list implementation."""
-    def __init__(self, task: Task):
-        self.task = task
-        self.next = None
-
-
 class RetryQueue:
     """
     Production-ready retry queue with exponential backoff.
@@ -61,12 +59,21 @@ class RetryQueue:
     """
     
     def __init__(self, base_delay: float = 1.0, max_retries: int = 3):
-        self.retry_queue_head = None
-        self.retry_queue_tail = None
-        self.dlq_head = None  # Dead Letter Queue
-        self.dlq_tail = None
+        # Waiting retries as a min-heap of [next_retry_time, seq, task];
+        # seq breaks ties so Tasks are never compared, task is None once
+        # removed (dropped lazily when popped)
+        self._heap: List[list] = []
+        self._seq = itertools.count()
+        # Entries whose retry time has passed (seq -> entry, in time
+        # order) until removed
+        self._due: Dict[int, list] = {}
+        # task id -> its live entries, oldest first
+        self._entries: Dict[str, List[list]] = {}
+        self.dlq: deque = deque()  # Dead Letter Queue, oldest first
         self.base_delay = base_delay
         self.max_retries = max_retries
+        # Backoff per retry, precomputed: _delays[n] = base_delay * 2^n
+        self._delays = [base_delay * (1 << n) for n in range(max_retries)]
         self.retry_count = 0
         self.dlq_count = 0
         self.tasks_by_id: Dict[str, Task] = {}
@@ -93,17 +100,14 @@ class RetryQueue:
             self.move_to_dlq(task)
             return False
         
-        # Calculate exponential backoff
-        wait_time = self.base_delay * (2 ** (task.retry_count - 1))
+        # Exponential backoff (from the precomputed table)
+        wait_time = self._delays[task.retry_count - 1]
         task.next_retry_time = time.time() + wait_time
         
         # Add to retry queue
-        node = Node(task)
-        if not self.retry_queue_tail:
-            self.retry_queue_head = self.retry_queue_tail = node
-        else:
-            self.retry_queue_tail.next = node
-            self.retry_queue_tail = node
+        entry = [task.next_retry_time, next(self._seq), task]
+        heapq.heappush(self._heap, entry)
+        self._entries.setdefault(task.id, []).append(entry)
         
         self.retry_count += 1
         self.tasks_by_id[task.id] = task
@@ -116,72 +120,63 @@ class RetryQueue:
         DLQ is for tasks that have exhausted all retries.
         These need manual investigation or special handling.
         """
-        node = Node(task)
-        if not self.dlq_tail:
-            self.dlq_head = self.dlq_tail = node
-        else:
-            self.dlq_tail.next = node
-            self.dlq_tail = node
-        
+        self.dlq.append(task)
         self.dlq_count += 1
         print(f"⚠️  Task {task.id} moved to DLQ after {task.retry_count} retries")
     
-    def get_retryable_tasks(self) -> List[Task]:
+    def get_retryable_tasks(self, now: Optional[float] = None) -> List[Task]:
         """
         Get all tasks ready for retry (retry time has passed).
         
-        Time Complexity: O(n) where n = tasks in retry queue
+        Tasks stay in the retry queue until removed, earliest first.
+        
+        now: Current time.time(), if the caller already has it
+        
+        Time Complexity: O(k log n) for the k tasks that became due
+        since the last call (the rest of the heap isn't touched)
         """
-        current_time = time.time()
-        retryable = []
+        return list(self.iter_retryable(now))
+    
+    def iter_retryable(self, now: Optional[float] = None):
+        """
+        Yield tasks ready for retry, earliest first, without building a list.
         
-        current = self.retry_queue_head
-        while current:
-            if current.task.next_retry_time <= current_time:
-                retryable.append(current.task)
-            current = current.next
+        Callers that want only the first, e.g. next(..., None), stop
+        early. Don't remove tasks while iterating: take what you need,
+        then remove.
+        """
+        current_time = time.time() if now is None else now
+        heap = self._heap
+        due = self._due
         
-        return retryable
+        while heap and heap[0][0] <= current_time:
+            entry = heapq.heappop(heap)
+            if entry[2] is not None:
+                due[entry[1]] = entry
+        
+        for entry in due.values():
+            yield entry[2]
     
     def remove_from_retry_queue(self, task_id: str) -> Optional[Task]:
         """Remove and return a task from the retry queue."""
-        if not self.retry_queue_head:
+        entries = self._entries.get(task_id)
+        if not entries:
             return None
         
-        # Handle head removal
-        if self.retry_queue_head.task.id == task_id:
-            task = self.retry_queue_head.task
-            self.retry_queue_head = self.retry_queue_head.next
-            if not self.retry_queue_head:
-                self.retry_queue_tail = None
-            self.retry_count -= 1
-            return task
-        
-        # Handle middle/tail removal
-        prev = self.retry_queue_head
-        current = self.retry_queue_head.next
-        
-        while current:
-            if current.task.id == task_id:
-                task = current.task
-                prev.next = current.next
-                if current == self.retry_queue_tail:
-                    self.retry_queue_tail = prev
-                self.retry_count -= 1
-                return task
-            prev = current
-            current = current.next
-        
-        return None
+        # Earliest-scheduled entry for this id
+        entry = entries.pop(0)
+        if not entries:
+            del self._entries[task_id]
+        
+        task = entry[2]
+        if self._due.pop(entry[1], None) is None:
+            entry[2] = None  # Still waiting: lazily dropped from the heap
+        self.retry_count -= 1
+        return task
     
     def get_dlq_tasks(self) -> List[Task]:
         """Get all tasks in the Dead Letter Queue."""
-        tasks = []
-        current = self.dlq_head
-        while current:
-            tasks.append(current.task)
-            current = current.next
-        return tasks
+        return list(self.dlq)
     
     def stats(self) -> Dict[str, Any]:
         """Get retry queue statistics."""
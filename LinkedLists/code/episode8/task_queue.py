@@ -19,7 +19,7 @@ use these exact patterns. This is how production task queues actually work!
 """
 
 import time
-from typing import Any, Dict, List, Optional, Callable
+from typing import Any, Dict, Iterable, List, Optional, Callable
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -49,6 +49,10 @@ class TaskPriority(Enum):
     LOW = "low"
 
 
+# Rate-limit bucket key per priority (built once instead of per submit)
+_RATE_LIMIT_KEYS = {priority: f"task_type_{priority.value}" for priority in TaskPriority}
+
+
 @dataclass
 class TaskDefinition:
     """Extended task definition with all production features."""
@@ -98,9 +102,16 @@ class ProductionTaskQueue:
     ):
         # Layer 2: Priority queue
         self.priority_queue = PriorityQueue()
+        # Priority -> bound append of that level's deque (one dict lookup
+        # and one C call per enqueue)
+        self._enqueue_by_priority: Dict[TaskPriority, Callable[[Any], None]] = {
+            TaskPriority.HIGH: self.priority_queue.high.append,
+            TaskPriority.MEDIUM: self.priority_queue.medium.append,
+            TaskPriority.LOW: self.priority_queue.low.append,
+        }
         
         # Layer 3: Rate limiter
-        self.rate_limiter = RateLimiter(max_requests=rate_limit, window_seconds=60)
+        self.rate_limiter = RateLimiter(max_requests_per_minute=rate_limit)
         
         # Layer 4: Dependency resolver
         self.dependency_resolver = DependencyResolver()
@@ -110,6 +121,7 @@ class ProductionTaskQueue:
         
         # Task registry
         self.tasks: Dict[str, TaskDefinition] = {}
+        self._pending: set = set()  # ids of tasks in PENDING status
         self.completed_tasks: Dict[str, TaskDefinition] = {}
         
         # Metrics
@@ -130,13 +142,65 @@ class ProductionTaskQueue:
         
         Returns True if task was queued, False if rejected (rate limited or has cycles).
         """
-        # Create task definition
-        task_def = TaskDefinition(
+        task_def = self._new_task(task_id, data, priority, dependencies)
+        if not self._admit(task_def):
+            return False
+        
+        if task_def.status == TaskStatus.QUEUED:
+            # Enqueue based on priority
+            self._enqueue_by_priority[priority](task_def)
+            self.total_enqueued += 1
+        return True
+    
+    def submit_many(self, tasks: Iterable[Dict[str, Any]]) -> List[bool]:
+        """
+        Submit several tasks at once.
+        
+        Each item holds submit()'s keyword arguments (task_id, data and
+        optionally priority, dependencies). Tasks are checked in order as
+        with submit(), then the ready ones go onto the priority queue with
+        one extend per priority level.
+        
+        Returns submit()'s result for each task, in order.
+        """
+        results = []
+        ready: Dict[TaskPriority, List[TaskDefinition]] = {}
+        for spec in tasks:
+            task_def = self._new_task(**spec)
+            admitted = self._admit(task_def)
+            results.append(admitted)
+            if admitted and task_def.status == TaskStatus.QUEUED:
+                ready.setdefault(task_def.priority, []).append(task_def)
+        
+        for priority, batch in ready.items():
+            self.priority_queue.enqueue_many(batch, priority)
+            self.total_enqueued += len(batch)
+        return results
+    
+    @staticmethod
+    def _new_task(
+        task_id: str,
+        data: Any,
+        priority: TaskPriority = TaskPriority.MEDIUM,
+        dependencies: Optional[List[str]] = None
+    ) -> TaskDefinition:
+        """Create a task definition from submit() arguments."""
+        return TaskDefinition(
             id=task_id,
             data=data,
             priority=priority,
             dependencies=dependencies or []
         )
+    
+    def _admit(self, task_def: TaskDefinition) -> bool:
+        """
+        Dependency and rate-limit checks shared by submit/submit_many.
+        
+        Registers the task and sets its status to QUEUED (ready to be
+        enqueued by the caller) or PENDING. Returns False if rejected.
+        """
+        task_id = task_def.id
+        priority = task_def.priority
         
         # Add to dependency graph
         for dep_id in task_def.dependencies:
@@ -150,7 +214,7 @@ class ProductionTaskQueue:
             return False
         
         # Check rate limit
-        if not self.rate_limiter.allow_request(f"task_type_{priority.value}"):
+        if not self.rate_limiter.check(_RATE_LIMIT_KEYS[priority]):
             print(f"⏸️  Task {task_id} rate limited")
             self.total_rate_limited += 1
             # Could optionally queue for later instead of rejecting
@@ -161,51 +225,48 @@ class ProductionTaskQueue:
         
         # Check if dependencies are satisfied
         if self.dependency_resolver.can_run(task_id):
-            # Enqueue based on priority
             task_def.status = TaskStatus.QUEUED
-            if priority == TaskPriority.HIGH:
-                self.priority_queue.enqueue_high(task_def)
-            elif priority == TaskPriority.MEDIUM:
-                self.priority_queue.enqueue_medium(task_def)
-            else:
-                self.priority_queue.enqueue_low(task_def)
-            
-            self.total_enqueued += 1
             print(f"✅ Task {task_id} queued with {priority.value} priority")
             return True
         else:
             # Wait for dependencies
             task_def.status = TaskStatus.PENDING
+            self._pending.add(task_id)
             print(f"⏳ Task {task_id} waiting for dependencies: {task_def.dependencies}")
             return True
     
-    def process_next(self) -> Optional[TaskDefinition]:
+    def process_next(self, now: Optional[float] = None) -> Optional[TaskDefinition]:
         """
         Process the next task from the queue.
         
+        now (time.time(), read here if not given) is shared by the retry
+        check and the task's started_at: one clock read per task.
+        
         Returns the task that was processed, or None if queue is empty.
         """
+        if now is None:
+            now = time.time()
+        
         # Check retry queue first
-        retryable_tasks = self.retry_queue.get_retryable_tasks()
-        if retryable_tasks:
-            task_obj = retryable_tasks[0]
+        task_obj = next(self.retry_queue.iter_retryable(now), None)
+        if task_obj is not None:
             task_def = self.tasks.get(task_obj.id)
             if task_def:
                 print(f"🔄 Retrying task {task_def.id} (attempt {task_obj.retry_count + 1})")
                 self.retry_queue.remove_from_retry_queue(task_obj.id)
-                return self._execute_task(task_def)
+                return self._execute_task(task_def, now)
         
         # Get next task from priority queue
         task_def = self.priority_queue.dequeue()
         if not task_def:
             return None
         
-        return self._execute_task(task_def)
+        return self._execute_task(task_def, now)
     
-    def _execute_task(self, task_def: TaskDefinition) -> TaskDefinition:
+    def _execute_task(self, task_def: TaskDefinition, now: Optional[float] = None) -> TaskDefinition:
         """Execute a task (simulate with success/failure)."""
         task_def.status = TaskStatus.RUNNING
-        task_def.started_at = time.time()
+        task_def.started_at = time.time() if now is None else now
         
         print(f"▶️  Executing task {task_def.id}: {task_def.data}")
         
@@ -224,7 +285,7 @@ class ProductionTaskQueue:
             self.dependency_resolver.mark_complete(task_def.id)
             
             # Check if any pending tasks can now run
-            self._check_pending_tasks()
+            self._check_pending_tasks(task_def.id)
             
             print(f"✅ Task {task_def.id} completed in {task_def.completed_at - task_def.started_at:.3f}s")
         else:
@@ -245,21 +306,29 @@ class ProductionTaskQueue:
         
         return task_def
     
-    def _check_pending_tasks(self):
-        """Check if any pending tasks can now be queued."""
-        for task_id, task_def in list(self.tasks.items()):
-            if task_def.status == TaskStatus.PENDING:
-                if self.dependency_resolver.can_run(task_id):
-                    # Dependencies satisfied - queue the task
-                    task_def.status = TaskStatus.QUEUED
-                    if task_def.priority == TaskPriority.HIGH:
-                        self.priority_queue.enqueue_high(task_def)
-                    elif task_def.priority == TaskPriority.MEDIUM:
-                        self.priority_queue.enqueue_medium(task_def)
-                    else:
-                        self.priority_queue.enqueue_low(task_def)
-                    
-                    print(f"✅ Task {task_id} dependencies satisfied, now queued")
+    def _check_pending_tasks(self, completed_id: Optional[str] = None):
+        """
+        Check if any pending tasks can now be queued.
+        
+        Given the task that just completed, only its pending dependents
+        are checked; otherwise every pending task is.
+        """
+        pending = self._pending
+        if completed_id is None:
+            candidates = [task_id for task_id in self.tasks if task_id in pending]
+        else:
+            candidates = [task_id for task_id in self.dependency_resolver.dependents_of(completed_id)
+                          if task_id in pending]
+        
+        for task_id in candidates:
+            if self.dependency_resolver.can_run(task_id):
+                # Dependencies satisfied - queue the task
+                task_def = self.tasks[task_id]
+                task_def.status = TaskStatus.QUEUED
+                pending.discard(task_id)
+                self._enqueue_by_priority[task_def.priority](task_def)
+                
+                print(f"✅ Task {task_id} dependencies satisfied, now queued")
     
     def get_stats(self) -> Dict[str, Any]:
         """Get queue statistics."""
@@ -268,10 +337,13 @@ class ProductionTaskQueue:
             "total_completed": self.total_completed,
             "total_failed": self.total_failed,
             "total_rate_limited": self.total_rate_limited,
-            "pending_tasks": sum(1 for t in self.tasks.values() if t.status == TaskStatus.PENDING),
-            "queued_tasks": self.priority_queue.size(),
+            "pending_tasks": len(self._pending),
+            "queued_tasks": sum(self.priority_queue.size_by_priority().values()),
             "retry_queue": self.retry_queue.stats(),
-            "rate_limiter_stats": self.rate_limiter.stats(),
+            "rate_limiter_stats": {
+                "limit_per_minute": self.rate_limiter.limit,
+                "tracked_keys": len(self.rate_limiter.cache),
+            },
         }
     
     def process_all(self):